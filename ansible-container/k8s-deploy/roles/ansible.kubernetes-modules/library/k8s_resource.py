@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+from ansible.module_utils.k8s_common import KubernetesAnsibleException
+from ansible.module_utils.openshift_common import OpenShiftAnsibleModule
+
+DOCUMENTATION = '''
+module: k8s_resource
+short_description: Kubernetes and OpenShift objects of any kind
+description:
+- Manage the lifecycle of an object of any kind supported by the OpenShift client. Supports check mode, and
+  attempts to to be idempotent.
+- The kind is selected by I(kind) and I(api_version), or inferred from the first of I(resource_definition),
+  I(resource_definitions) or I(src). All other options are those of the module for that kind, for example
+  M(k8s_v1_service) for a Service.
+version_added: 2.3.0
+author: OpenShift (@openshift)
+options:
+  api_version:
+    description:
+    - The API version of the object, either as found in a resource definition, such as C(extensions/v1beta1),
+      or as found in module names, such as C(v1beta1). Defaults to the apiVersion of the resource definition.
+  api_key:
+    description:
+    - Token used to connect to the API.
+  cert_file:
+    description:
+    - Path to a certificate used to authenticate with the API.
+    type: path
+  context:
+    description:
+    - The name of a context found in the Kubernetes config file.
+  debug:
+    description:
+    - Enable debug output from the OpenShift helper. Logging info is written to KubeObjHelper.log
+    default: false
+    type: bool
+  force:
+    description:
+    - If set to C(True), and I(state) is C(present), an existing object will updated,
+      and lists will be replaced, rather than merged.
+    default: false
+    type: bool
+  host:
+    description:
+    - Provide a URL for acessing the Kubernetes API.
+  key_file:
+    description:
+    - Path to a key file used to authenticate with the API.
+    type: path
+  kind:
+    description:
+    - The kind of the object, such as C(Service) or C(deployment_config). Defaults to the kind of the resource
+      definition.
+  kubeconfig:
+    description:
+    - Path to an existing Kubernetes config file. If not provided, and no other connection
+      options are provided, the openshift client will attempt to load the default
+      configuration file from I(~/.kube/config.json).
+    type: path
+  password:
+    description:
+    - Provide a password for connecting to the API. Use in conjunction with I(username).
+  resource_definition:
+    description:
+    - Provide the YAML definition for the object, bypassing any modules parameters
+      intended to define object attributes.
+    type: dict
+  resource_definitions:
+    description:
+    - Provide a list of YAML definitions, of any kind. Each must include I(apiVersion) and I(kind). Mutually
+      exclusive with I(resource_definition) and I(src).
+    type: list
+  src:
+    description:
+    - Provide a path to a file containing the YAML definition of the object, or several definitions separated
+      by C(---). Mutually exclusive with I(resource_definition).
+    type: path
+  ssl_ca_cert:
+    description:
+    - Path to a CA certificate used to authenticate with the API.
+    type: path
+  state:
+    description:
+    - Determines if an object should be created, patched, or deleted. When set to
+      C(present), the object will be created, if it does not exist, or patched, if
+      parameter values differ from the existing object's attributes, and deleted,
+      if set to C(absent).
+    default: present
+    choices:
+    - present
+    - absent
+  username:
+    description:
+    - Provide a username for connecting to the API.
+  verify_ssl:
+    description:
+    - Whether or not to verify the API server's SSL certificates.
+    type: bool
+  workers:
+    description:
+    - The number of resources of I(resource_definitions) or I(src) reconciled at a time.
+    default: 4
+    type: int
+requirements:
+- kubernetes == 1.0.0
+'''
+
+EXAMPLES = '''
+- name: Create a namespace
+  k8s_resource:
+    kind: Namespace
+    api_version: v1
+    name: k8s-namespace
+    state: present
+
+- name: Create a service from its definition
+  k8s_resource:
+    state: present
+    resource_definition:
+      apiVersion: v1
+      kind: Service
+      metadata:
+        name: web
+        namespace: k8s-namespace
+      spec:
+        selector:
+          app: web
+        ports:
+        - port: 80
+          targetPort: 8000
+
+- name: Create everything found in a file
+  k8s_resource:
+    state: present
+    src: /path/to/app.yml
+'''
+
+RETURN = '''
+api_version:
+  type: string
+  description: Requested API version
+changed:
+  type: bool
+  description: Whether any object was created, patched or deleted
+results:
+  type: list
+  description:
+  - Returned instead of the object, when I(resource_definitions) or a multi-document I(src) is used. Each
+    entry holds the return values for one object, plus its I(kind).
+  returned: when more than one resource is requested
+'''
+
+
+def main():
+    try:
+        module = OpenShiftAnsibleModule.for_resource()
+    except KubernetesAnsibleException as exc:
+        # The resource type could not be determined, or the helper failed to init, so there is no module object.
+        # All we can do is raise the error.
+        raise Exception(str(exc))
+
+    try:
+        module.execute_module()
+    except KubernetesAnsibleException as exc:
+        module.fail_json(msg="Module failed!", error=str(exc))
+
+
+if __name__ == '__main__':
+    main()
@@ -16,14 +16,16 @@
 # You should have received a copy of the GNU General Public License
 # along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
 
-from ansible.module_utils.k8s_common import KubernetesAnsibleException, KubernetesAnsibleModule
-
-try:
-    from openshift.helper.ansible import OpenShiftAnsibleModuleHelper, ARG_ATTRIBUTES_BLACKLIST
-    from openshift.helper.exceptions import KubernetesException, OpenShiftException
-    HAS_OPENSHIFT_HELPER = True
-except ImportError as exc:
-    HAS_OPENSHIFT_HELPER = False
+from ansible.module_utils.k8s_common import (
+    TEARDOWN_KINDS,
+    KubernetesAnsibleException,
+    KubernetesAnsibleModule,
+    KubernetesAnsibleResourceException,
+    helper_ansible,
+    helper_exceptions,
+    helper_params,
+    timed,
+)
 
 
 class OpenShiftAnsibleException(KubernetesAnsibleException):
@@ -31,40 +33,53 @@ class OpenShiftAnsibleException(KubernetesAnsibleException):
 
 
 class OpenShiftAnsibleModule(KubernetesAnsibleModule):
-    def __init__(self, kind, api_version):
-        if not HAS_OPENSHIFT_HELPER:
-            raise OpenShiftAnsibleException(
-                "This module requires the OpenShift Python client. Try `pip install openshift`"
-            )
+    teardown_kinds = (
+        ('v1', 'DeploymentConfig'),
+        ('v1', 'BuildConfig'),
+        ('v1', 'Route'),
+        ('v1', 'ImageStream'),
+    ) + TEARDOWN_KINDS
 
+    def __init__(self, kind, api_version, extra_argspec=None):
         try:
-            super(OpenShiftAnsibleModule, self).__init__(kind, api_version)
+            super(OpenShiftAnsibleModule, self).__init__(kind, api_version, extra_argspec=extra_argspec)
         except KubernetesAnsibleException as exc:
             raise OpenShiftAnsibleException(exc.args)
 
     @staticmethod
     def get_helper(api_version, kind):
-        return OpenShiftAnsibleModuleHelper(api_version, kind)
+        return helper_ansible.OpenShiftAnsibleModuleHelper(api_version, kind)
 
-    def _create(self, namespace):
-        if self.kind.lower() == 'project':
-            return self._create_project()
+    @property
+    def helper(self):
+        try:
+            return super(OpenShiftAnsibleModule, self).helper
+        except OpenShiftAnsibleException:
+            raise
+        except KubernetesAnsibleException as exc:
+            raise OpenShiftAnsibleException(*exc.args)
+
+    def _create(self, helper, kind, params):
+        if kind.lower() == 'project':
+            return self._create_project(helper, params)
         else:
-            return super(OpenShiftAnsibleModule, self)._create(namespace)
+            return super(OpenShiftAnsibleModule, self)._create(helper, kind, params)
 
-    def _create_project(self):
+    @timed('write')
+    def _create_project(self, helper, params):
+        if self.check_mode:
+            return None
         new_obj = None
         k8s_obj = None
         try:
-            new_obj = self.helper.object_from_params(self.params)
-        except KubernetesException as exc:
-            self.fail_json(msg="Failed to create object: {}".format(exc.message))
+            new_obj = helper.object_from_params(helper_params(helper, params))
+        except helper_exceptions.KubernetesException as exc:
+            raise KubernetesAnsibleResourceException("Failed to create object: {}".format(exc.message))
         try:
-            k8s_obj = self.helper.create_project(metadata=new_obj.metadata,
-                                                 display_name=self.params.get('display_name'),
-                                                 description=self.params.get('description'))
-        except KubernetesException as exc:
-            self.fail_json(msg='Failed to retrieve requested object',
-                           error=exc.value.get('status'))
+            k8s_obj = helper.create_project(metadata=new_obj.metadata,
+                                            display_name=params.get('display_name'),
+                                            description=params.get('description'))
+        except helper_exceptions.KubernetesException as exc:
+            raise KubernetesAnsibleResourceException('Failed to retrieve requested object',
+                                                     error=exc.value.get('status'))
         return k8s_obj
-
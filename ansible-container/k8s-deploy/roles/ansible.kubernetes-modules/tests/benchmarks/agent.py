@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Compare per-task latency with and without the local agent (module_utils/k8s_agent.py). Each task is a separate
+module process, as under ansible-playbook, that either finds a pod in the fake API unchanged, or patches a label on
+it. With the agent, the helper, its client configuration and its connections are kept warm between tasks.
+
+    python tests/benchmarks/agent.py --tasks 20 --latency 0.01
+"""
+
+import argparse
+import copy
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_api import FakeApiServer
+from runner import ROLE_PATH, write_kubeconfig
+from startup import POD, run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tasks', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.01)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='k8s-agent-')
+    socket_path = os.path.join(workdir, 'agent.sock')
+    try:
+        with FakeApiServer(latency=args.latency) as api:
+            module_args = dict(kubeconfig=write_kubeconfig(api.url), host=api.url, state='present',
+                               resource_definition=POD)
+            # Create the pod, and warm the argspec cache
+            run('k8s_v1_pod', module_args, workdir)
+
+            def task_args(task, update):
+                if not update:
+                    return module_args
+                args = dict(module_args, resource_definition=copy.deepcopy(POD))
+                args['resource_definition']['metadata'].setdefault('labels', {})['task'] = str(task)
+                return args
+
+            for mode in ('without agent', 'with agent'):
+                env = {}
+                agent = None
+                if mode == 'with agent':
+                    agent = subprocess.Popen([sys.executable, os.path.join(ROLE_PATH, 'module_utils', 'k8s_agent.py'),
+                                              '--socket', socket_path])
+                    while not os.path.exists(socket_path):
+                        time.sleep(0.05)
+                    env['K8S_AGENT_SOCKET'] = socket_path
+                try:
+                    for task_kind, update in (('no-op', False), ('update', True)):
+                        api.state.reset_counts()
+                        label = mode.replace(' ', '-') + '-{}'
+                        timings = sorted(run('k8s_v1_pod', task_args(label.format(task), update), workdir, **env)[0]
+                                         for task in range(args.tasks))
+                        print('{:<14} {:<7} tasks={:<4} median={:.3f}s  min={:.3f}s  max={:.3f}s  requests={}'.format(
+                            mode, task_kind, args.tasks, timings[len(timings) // 2], timings[0], timings[-1],
+                            api.state.requests))
+                finally:
+                    if agent is not None:
+                        agent.terminate()
+                        agent.wait()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
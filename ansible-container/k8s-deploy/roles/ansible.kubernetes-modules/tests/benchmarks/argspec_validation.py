@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Compare AnsibleModule argument validation against the whole generated argspec with validation against only the
+options a task supplies, as KubernetesAnsibleModule.supplied_argspec() selects them, for kinds whose argspec
+dominates startup: openshift_v1_template and openshift_v1_pod_security_policy_review.
+
+    python tests/benchmarks/argspec_validation.py --runs 50
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from runner import add_module_utils_path, module_args, run_module
+
+TEMPLATE = {
+    'apiVersion': 'v1',
+    'kind': 'Template',
+    'metadata': {'name': 'web', 'namespace': 'bench'},
+    'objects': [{'apiVersion': 'v1', 'kind': 'Service', 'metadata': {'name': '${NAME}'}}],
+    'parameters': [{'name': 'NAME', 'value': 'web'}],
+}
+
+# A review is only ever created, so its module has no state or resource_definition option
+POD_SECURITY_POLICY_REVIEW = {
+    'spec_template_spec_containers': [{'name': 'web', 'image': 'nginx:1.13'}],
+    'spec_service_account_names': ['default'],
+}
+
+CASES = (
+    ('openshift_v1_template', 'template', dict(state='present', resource_definition=TEMPLATE)),
+    ('openshift_v1_pod_security_policy_review', 'pod_security_policy_review', POD_SECURITY_POLICY_REVIEW),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix='k8s-argspec-')
+    try:
+        os.environ['K8S_ARGSPEC_CACHE_DIR'] = cache_dir
+        add_module_utils_path()
+        from ansible.module_utils.basic import AnsibleModule
+        from ansible.module_utils.openshift_common import OpenShiftAnsibleModule
+
+        for module_name, kind, task_args in CASES:
+            with module_args(task_args):
+                module = OpenShiftAnsibleModule(kind, 'V1')
+                specs = (
+                    ('whole', module.argspec),
+                    ('supplied', module.supplied_argspec(task_args)),
+                )
+                for mode, spec in specs:
+                    start = time.time()
+                    for _ in range(args.runs):
+                        AnsibleModule(argument_spec=spec, supports_check_mode=True)
+                    elapsed = (time.time() - start) / args.runs
+                    print('{:<40} {:<9} options={:<6} validation={:.2f}ms'.format(
+                        module_name, mode, len(spec), elapsed * 1e3))
+
+            # An unknown option is reported with every supported option, not only those the task supplied
+            result = run_module(OpenShiftAnsibleModule, kind, 'V1', dict(task_args, unknown_option=True))
+            # Ansible 2.3 joins the names with ',', and ansible-core with ', ', ending with a period and naming the
+            # aliases of each option in parentheses
+            listed = result['msg'].split('Supported parameters include: ')[1].strip().rstrip('.')
+            supported = [item.strip().split(' (')[0] for item in listed.split(',')]
+            assert set(module.argspec) <= set(supported), result['msg']
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
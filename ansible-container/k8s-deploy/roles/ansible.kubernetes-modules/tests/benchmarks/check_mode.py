@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Measure --check runs over a whole environment of large manifests. N deployments with many containers are applied in
+one bulk request: first in check mode against an empty namespace (every object would be created), then for real,
+then in check mode again with a changed image (every object would be patched), and finally with the change applied.
+Reports wall time and, on Python 3, peak memory allocated for each pass.
+
+    python tests/benchmarks/check_mode.py --objects 50 --containers 100
+"""
+
+import argparse
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from diff_engine import deployment
+from fake_api import FakeApiServer
+from runner import add_module_utils_path, deployment_api_version, run_module, write_kubeconfig
+
+
+def definitions(objects, containers, image):
+    result = []
+    for index in range(objects):
+        definition = deployment(containers, image=image)
+        definition['metadata']['name'] = 'bench-{}'.format(index)
+        result.append(definition)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--objects', type=int, default=50)
+    parser.add_argument('--containers', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    add_module_utils_path()
+    from ansible.module_utils.k8s_common import KubernetesAnsibleModule
+
+    passes = (
+        ('check create', True, 'busybox:1'),
+        ('create', False, 'busybox:1'),
+        ('check patch', True, 'busybox:2'),
+        ('patch', False, 'busybox:2'),
+    )
+    with FakeApiServer() as api:
+        auth = dict(kubeconfig=write_kubeconfig(api.url), host=api.url, workers=args.workers, return_mode='minimal')
+        run_module(KubernetesAnsibleModule, 'namespace', 'V1', dict(auth, state='present', name='bench'))
+        for name, check_mode, image in passes:
+            api.state.reset_counts()
+            module_args = dict(auth, state='present', _ansible_check_mode=check_mode,
+                               resource_definitions=definitions(args.objects, args.containers, image))
+            if tracemalloc:
+                tracemalloc.start()
+            start = time.time()
+            result = run_module(KubernetesAnsibleModule, 'deployment', deployment_api_version(), module_args)
+            elapsed = time.time() - start
+            peak = tracemalloc.get_traced_memory()[1] if tracemalloc else 0
+            if tracemalloc:
+                tracemalloc.stop()
+            assert not result.get('failed'), result.get('msg')
+            changed = sum(1 for item in result['results'] if item.get('changed'))
+            print('{:<13} objects={:<5} changed={:<5} wall={:.3f}s  peak={:.1f}MB  requests={}'.format(
+                name, args.objects, changed, elapsed, peak / 1e6, api.state.requests))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Update one deployment from many writers at once, and count conflicts, retries and lost updates. Each writer adds its
+own environment variable to the deployment's container. The writers run as the workers of one bulk request, so they
+read and patch the same object concurrently. Because each update is conditional on the resourceVersion it read, a
+writer that loses the race gets a conflict, and re-applies its change to the latest version. No update is lost.
+
+    python tests/benchmarks/concurrent_updates.py --writers 8 --latency 0.02
+"""
+
+import argparse
+import time
+
+from fake_api import FakeApiServer
+from runner import add_module_utils_path, deployment_api_version, run_module, write_kubeconfig
+
+
+def deployment(env):
+    return {
+        'apiVersion': 'extensions/v1beta1',
+        'kind': 'Deployment',
+        'metadata': {'name': 'shared', 'namespace': 'bench'},
+        'spec': {
+            'replicas': 1,
+            'template': {
+                'metadata': {'labels': {'app': 'shared'}},
+                'spec': {'containers': [{'name': 'web', 'image': 'nginx:1.13', 'env': env}]},
+            },
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--conflict-retries', type=int, default=10)
+    args = parser.parse_args()
+
+    add_module_utils_path()
+    from ansible.module_utils.k8s_common import KubernetesAnsibleModule
+
+    api_version = deployment_api_version()
+    with FakeApiServer(latency=args.latency) as api:
+        auth = dict(kubeconfig=write_kubeconfig(api.url), host=api.url)
+        run_module(KubernetesAnsibleModule, 'namespace', 'V1', dict(auth, state='present', name='bench'))
+        run_module(KubernetesAnsibleModule, 'deployment', api_version,
+                   dict(auth, state='present', resource_definition=deployment([])))
+        api.state.reset_counts()
+
+        writers = [deployment([{'name': 'WRITER_{}'.format(i), 'value': str(i)}]) for i in range(args.writers)]
+        start = time.time()
+        result = run_module(KubernetesAnsibleModule, 'deployment', api_version,
+                            dict(auth, state='present', workers=args.writers, return_mode='minimal',
+                                 conflict_retries=args.conflict_retries, resource_definitions=writers))
+        elapsed = time.time() - start
+
+        failed = [item for item in result['results'] if item.get('failed')]
+        conflicts = sum(item.get('conflicts', 0) for item in result['results'])
+        retries = sum(item.get('retries', 0) for item in result['results'])
+        with api.state.lock:
+            # Depending on the client version, deployments are served from the extensions or the apps group
+            stored = [obj for key, obj in api.state.objects.items() if key[1:] == ('bench', 'deployments', 'shared')][0]
+            env = list(stored['spec']['template']['spec']['containers'][0].get('env') or [])
+        lost = args.writers - len(failed) - len([var for var in env if var['name'].startswith('WRITER_')])
+        print('writers={:<4} wall={:.3f}s  conflicts={:<4} retries={:<4} failed={:<4} lost updates={}  requests={}'
+              .format(args.writers, elapsed, conflicts, retries, len(failed), lost, api.state.requests))
+
+
+if __name__ == '__main__':
+    main()
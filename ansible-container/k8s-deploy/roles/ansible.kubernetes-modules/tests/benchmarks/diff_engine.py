@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Compare the object and params diff engines of KubernetesAnsibleModule on large synthetic deployments. For each
+size, a deployment with that many containers is created on the fake API, and then reconciled repeatedly, unchanged
+(no-op), and with its image switched back and forth, so that every run sends a patch (patch). Reports the mean time
+per reconcile, on Python 3 the peak memory allocated while reconciling, and the number of debug log serializations
+skipped because debug is off.
+
+    python tests/benchmarks/diff_engine.py --containers 10 100 500 --runs 20
+"""
+
+import argparse
+import copy
+import time
+
+from fake_api import FakeApiServer
+from runner import add_module_utils_path, deployment_api_version, module_args, write_kubeconfig
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def deployment(containers, image='busybox:1'):
+    return {
+        'apiVersion': 'extensions/v1beta1',
+        'kind': 'Deployment',
+        'metadata': {'name': 'bench', 'namespace': 'bench', 'labels': {'app': 'bench'}},
+        'spec': {
+            'replicas': 1,
+            'template': {
+                'metadata': {'labels': {'app': 'bench'}},
+                'spec': {
+                    'containers': [
+                        {
+                            'name': 'c{}'.format(i),
+                            'image': image,
+                            'env': [{'name': 'VAR{}'.format(j), 'value': str(j)} for j in range(10)],
+                            'ports': [{'containerPort': 8000 + i, 'protocol': 'TCP'}],
+                        } for i in range(containers)
+                    ],
+                },
+            },
+        },
+    }
+
+
+def measure(module, helper, api_version, params_cycle, runs):
+    """ Reconcile runs times, with each of params_cycle in turn, and return (mean seconds, peak bytes) """
+    if tracemalloc:
+        tracemalloc.start()
+    start = time.time()
+    for run in range(runs):
+        module._reconcile(helper, api_version, 'deployment', copy.copy(params_cycle[run % len(params_cycle)]))
+    elapsed = (time.time() - start) / runs
+    peak = None
+    if tracemalloc:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--containers', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    add_module_utils_path()
+    from ansible.module_utils.k8s_common import KubernetesAnsibleModule
+
+    api_version = deployment_api_version()
+    with FakeApiServer() as api:
+        auth = dict(kubeconfig=write_kubeconfig(api.url), host=api.url)
+        for size in args.containers:
+            definition = deployment(size)
+            with module_args(dict(auth, state='present', resource_definition=definition)):
+                module = KubernetesAnsibleModule('deployment', api_version)
+            helper = module.helper
+            helper.set_client_config(**auth)
+            params = dict(module.params, **module.resource_to_parameters(definition))
+            module._reconcile(helper, api_version, 'deployment', params)
+            changed = dict(params, **module.resource_to_parameters(deployment(size, image='busybox:2')))
+
+            for engine in ('object', 'params'):
+                # Every patch run is sent, as the image is switched back and forth. The object is left as requested
+                # by params, for the no-op runs.
+                cases = (('no-op', [params]), ('patch', [changed, params]))
+                for label, params_cycle in cases:
+                    module.debug_log.skipped = 0
+                    params_cycle = [dict(run_params, diff_engine=engine) for run_params in params_cycle]
+                    elapsed, peak = measure(module, helper, api_version, params_cycle, args.runs)
+                    module._reconcile(helper, api_version, 'deployment', dict(params, diff_engine=engine))
+                    print('containers={:<5} engine={:<7} {:<6} mean={:.4f}s  peak={}  log serializations skipped={}'
+                          .format(size, engine, label, elapsed, '{:.1f}KiB'.format(peak / 1024.0) if peak else 'n/a',
+                                  module.debug_log.skipped))
+
+
+if __name__ == '__main__':
+    main()
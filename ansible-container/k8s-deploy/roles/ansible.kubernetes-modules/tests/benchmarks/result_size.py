@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+"""
+Compare the size of the module result, and the time to serialize it, for each return_mode. N deployments are
+applied in one bulk request, as a play applying them to many hosts would, and the result is serialized as the
+controller and callback plugins do.
+
+    python tests/benchmarks/result_size.py --objects 200 --containers 5
+"""
+
+import argparse
+import json
+import time
+
+from diff_engine import deployment
+from fake_api import FakeApiServer
+from runner import add_module_utils_path, deployment_api_version, run_module, write_kubeconfig
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--objects', type=int, default=200)
+    parser.add_argument('--containers', type=int, default=5)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    add_module_utils_path()
+    from ansible.module_utils.k8s_common import KubernetesAnsibleModule
+
+    definitions = []
+    for index in range(args.objects):
+        definition = deployment(args.containers)
+        definition['metadata']['name'] = 'bench-{}'.format(index)
+        definitions.append(definition)
+
+    with FakeApiServer() as api:
+        auth = dict(kubeconfig=write_kubeconfig(api.url), host=api.url)
+        run_module(KubernetesAnsibleModule, 'namespace', 'V1', dict(auth, state='present', name='bench'))
+        for mode in ('full', 'minimal', 'none'):
+            result = run_module(KubernetesAnsibleModule, 'deployment', deployment_api_version(),
+                                dict(auth, state='present', return_mode=mode, resource_definitions=definitions))
+            assert not result.get('failed'), result.get('msg')
+            start = time.time()
+            for _ in range(args.runs):
+                payload = json.dumps(result, indent=4, sort_keys=True)
+            elapsed = (time.time() - start) / args.runs
+            print('{:<8} objects={:<5} result={:>9.1f}KB  serialize={:.2f}ms'.format(
+                mode, args.objects, len(payload) / 1e3, elapsed * 1e3))
+
+
+if __name__ == '__main__':
+    main()
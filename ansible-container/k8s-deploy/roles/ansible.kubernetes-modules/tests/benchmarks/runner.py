@@ -0,0 +1,92 @@
+"""
+Helpers for running the role's modules in-process against the fake API, without ansible-playbook.
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+ROLE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+LIBRARY_PATH = os.path.join(ROLE_PATH, 'library')
+
+KUBECONFIG = """
+apiVersion: v1
+kind: Config
+clusters:
+- name: fake
+  cluster:
+    server: {url}
+contexts:
+- name: fake
+  context:
+    cluster: fake
+    user: fake
+current-context: fake
+users:
+- name: fake
+  user:
+    token: fake-token
+"""
+
+
+def add_module_utils_path():
+    """
+    Make the role's module_utils importable as ansible.module_utils, as Ansible does when it runs a module. They
+    take precedence over those shipped with Ansible, which has its own k8s_common from 2.4 on.
+    """
+    import ansible.module_utils
+    path = os.path.join(ROLE_PATH, 'module_utils')
+    if path not in ansible.module_utils.__path__:
+        ansible.module_utils.__path__.insert(0, path)
+
+
+def write_kubeconfig(url):
+    """ Write a kubeconfig pointing at the fake API, and return its path """
+    fd, path = tempfile.mkstemp(prefix='kubeconfig-', suffix='.yml')
+    with os.fdopen(fd, 'w') as f:
+        f.write(KUBECONFIG.format(url=url))
+    return path
+
+
+def deployment_api_version():
+    """
+    The helper api_version for deployments. From kubernetes 3.0.0 on, the client has a Deployment model for each
+    API group, rather than V1beta1Deployment.
+    """
+    from kubernetes.client import models
+    return 'V1beta1' if hasattr(models, 'V1beta1Deployment') else 'AppsV1beta1'
+
+
+@contextlib.contextmanager
+def module_args(args):
+    """ Set the arguments AnsibleModule will read, as Ansible does when it runs a module """
+    from ansible.module_utils import basic
+    previous = getattr(basic, '_ANSIBLE_ARGS', None)
+    basic._ANSIBLE_ARGS = json.dumps({'ANSIBLE_MODULE_ARGS': args}).encode('utf-8')
+    try:
+        yield
+    finally:
+        basic._ANSIBLE_ARGS = previous
+
+
+def run_module(module_class, kind, api_version, args):
+    """
+    Construct module_class(kind, api_version) with args, run execute_module(), and return the parsed result
+    passed to exit_json() or fail_json().
+    """
+    stdout = sys.stdout
+    sys.stdout = io.StringIO() if sys.version_info[0] >= 3 else io.BytesIO()
+    try:
+        with module_args(args):
+            try:
+                module = module_class(kind, api_version)
+                module.execute_module()
+            except SystemExit:
+                pass
+        output = sys.stdout.getvalue()
+    finally:
+        sys.stdout = stdout
+    return json.loads(output)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Measure module startup: the time from the start of the module process to exit_json(), for
+k8s_v1_namespace_list and k8s_v1_pod, with a cold and a warm argspec cache. With a warm cache, constructing the
+module must not import the kubernetes client.
+
+    python tests/benchmarks/startup.py --runs 10
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from fake_api import FakeApiServer
+from runner import LIBRARY_PATH, write_kubeconfig
+
+POD = {
+    'apiVersion': 'v1',
+    'kind': 'Pod',
+    'metadata': {'name': 'bench', 'namespace': 'bench'},
+    'spec': {'containers': [{'name': 'web', 'image': 'busybox'}]},
+}
+
+
+def child(module_name):
+    """
+    Run a library module as Ansible would, and report on stderr the time to exit_json(), and whether the
+    kubernetes client had been imported once the module was constructed
+    """
+    import time
+    start = time.time()
+
+    from runner import add_module_utils_path
+    add_module_utils_path()
+    from ansible.module_utils import basic, k8s_common
+
+    constructed = {}
+
+    def record(original):
+        def wrapper(module, *args, **kwargs):
+            original(module, *args, **kwargs)
+            constructed['client_imported'] = 'kubernetes.client' in sys.modules
+        return wrapper
+
+    def report(original):
+        def wrapper(module, **kwargs):
+            sys.stderr.write(json.dumps({'elapsed': time.time() - start, 'failed': original.__name__ == 'fail_json',
+                                         'msg': kwargs.get('msg'),
+                                         'client_imported': constructed.get('client_imported')}) + '\n')
+            original(module, **kwargs)
+        return wrapper
+
+    k8s_common.KubernetesAnsibleModule.__init__ = record(k8s_common.KubernetesAnsibleModule.__init__)
+    basic.AnsibleModule.exit_json = report(basic.AnsibleModule.exit_json)
+    basic.AnsibleModule.fail_json = report(basic.AnsibleModule.fail_json)
+    basic._ANSIBLE_ARGS = os.environ['BENCH_MODULE_ARGS'].encode('utf-8')
+
+    import runpy
+    runpy.run_path(os.path.join(LIBRARY_PATH, module_name + '.py'), run_name='__main__')
+
+
+def run(module_name, args, cache_dir, **extra_env):
+    env = dict(os.environ, K8S_ARGSPEC_CACHE_DIR=cache_dir, K8S_AGENT_SOCKET='',
+               BENCH_MODULE_ARGS=json.dumps({'ANSIBLE_MODULE_ARGS': args}))
+    env.update(extra_env)
+    process = subprocess.Popen([sys.executable, __file__, '--child', module_name], env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, stderr = process.communicate()
+    lines = [line for line in stderr.decode('utf-8').splitlines() if line.startswith('{')]
+    if not lines:
+        raise RuntimeError('{} did not exit cleanly:\n{}'.format(module_name, stderr.decode('utf-8')))
+    report = json.loads(lines[-1])
+    if report['failed']:
+        raise RuntimeError('{} failed: {}'.format(module_name, report['msg']))
+    return report['elapsed'], report['client_imported']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--child')
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child)
+
+    with FakeApiServer() as api:
+        auth = dict(kubeconfig=write_kubeconfig(api.url), host=api.url)
+        cases = [
+            ('k8s_v1_namespace_list', dict(auth)),
+            ('k8s_v1_pod', dict(auth, state='present', resource_definition=POD)),
+        ]
+        for module_name, module_args in cases:
+            cache_dir = tempfile.mkdtemp(prefix='k8s-argspec-')
+            try:
+                cold = []
+                warm = []
+                for _ in range(args.runs):
+                    shutil.rmtree(cache_dir)
+                    cold.append(run(module_name, module_args, cache_dir)[0])
+                    elapsed, client_imported = run(module_name, module_args, cache_dir)
+                    assert not client_imported, '{} imported the client with a warm cache'.format(module_name)
+                    warm.append(elapsed)
+            finally:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            cold.sort()
+            warm.sort()
+            print('{:<24} cold median={:.3f}s  warm median={:.3f}s  (min {:.3f}s / {:.3f}s)'.format(
+                module_name, cold[len(cold) // 2], warm[len(warm) // 2], cold[0], warm[0]))
+
+
+if __name__ == '__main__':
+    main()
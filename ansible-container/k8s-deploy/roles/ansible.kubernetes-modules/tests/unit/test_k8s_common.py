@@ -0,0 +1,141 @@
+"""
+Unit checks for the comparison and argspec helpers of module_utils/k8s_common.py. They need Ansible and the OpenShift
+Rest Client, but no cluster.
+
+    python -m unittest discover -s tests/unit
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from runner import add_module_utils_path  # noqa: E402
+
+add_module_utils_path()
+
+from ansible.module_utils.k8s_common import (  # noqa: E402
+    KubernetesAnsibleModule, compile_argspec, significant_changes, value_contained
+)
+
+
+class Model(object):
+    """ Stands in for a client model """
+
+    def __init__(self, **values):
+        self.values = values
+
+    def to_dict(self):
+        return self.values
+
+
+class ValueContainedTest(unittest.TestCase):
+    def test_none_is_always_contained(self):
+        self.assertTrue(value_contained(None, {'a': 1}))
+
+    def test_dict_keys_are_a_subset(self):
+        self.assertTrue(value_contained({'a': 1}, {'a': 1, 'b': 2}))
+        self.assertFalse(value_contained({'a': 1, 'c': 3}, {'a': 1, 'b': 2}))
+        self.assertFalse(value_contained({'a': 1}, ['a']))
+
+    def test_camel_case_keys_match_snake_case(self):
+        self.assertTrue(value_contained({'containerPort': 80}, {'container_port': 80}))
+
+    def test_list_items_match_in_any_order(self):
+        current = [{'name': 'a', 'image': 'x'}, {'name': 'b', 'image': 'y'}]
+        self.assertTrue(value_contained([{'name': 'b'}, {'name': 'a'}], current))
+        self.assertFalse(value_contained([{'name': 'c'}], current))
+        self.assertFalse(value_contained([{'name': 'a'}], {'name': 'a'}))
+
+    def test_numbers_match_their_string_form(self):
+        self.assertTrue(value_contained(8080, '8080'))
+        self.assertFalse(value_contained(8080, '8081'))
+
+    def test_models_are_compared_as_dicts(self):
+        current = [Model(name='web', ports=[Model(container_port=80)])]
+        self.assertTrue(value_contained([{'name': 'web', 'ports': [{'containerPort': 80}]}], current))
+        self.assertFalse(value_contained([{'name': 'web', 'ports': [{'containerPort': 81}]}], current))
+
+
+class SignificantChangesTest(unittest.TestCase):
+    def test_number_and_same_string_is_dropped(self):
+        self.assertEqual(significant_changes([('change', ['spec', 'ports', 0, 'target_port'], (8080, '8080'))]), [])
+        self.assertEqual(significant_changes([('change', 'port', ('80', 80))]), [])
+
+    def test_real_changes_are_kept(self):
+        diff = [
+            ('change', 'target_port', (8080, '8081')),
+            ('change', 'image', ('a', 'b')),
+            ('change', 'replicas', (1, 2)),
+            ('change', 'paused', (True, 'True')),
+            ('add', 'labels', [('app', 'web')]),
+        ]
+        self.assertEqual(significant_changes(diff), diff)
+
+
+class ArgspecModule(KubernetesAnsibleModule):
+    """ A module with a fixed argspec, constructed without a helper or AnsibleModule """
+    argspec_table = None
+
+    def __init__(self, spec):
+        self.argspec_table = compile_argspec(spec)
+
+
+class SuppliedArgspecTest(unittest.TestCase):
+    SPEC = {
+        'name': {},
+        'namespace': {},
+        'state': {'default': 'present'},
+        'labels': {'type': 'dict', 'aliases': ['metadata_labels']},
+        'data': {'type': 'dict'},
+        'kubeconfig': {'required': True},
+    }
+
+    def setUp(self):
+        self.module = ArgspecModule(self.SPEC)
+
+    def test_supplied_options_and_those_always_validated(self):
+        spec = self.module.supplied_argspec({'name': 'web', '_ansible_check_mode': False})
+        self.assertEqual(sorted(spec), ['kubeconfig', 'name', 'state'])
+
+    def test_aliases_select_their_option(self):
+        spec = self.module.supplied_argspec({'metadata_labels': {'app': 'web'}})
+        self.assertEqual(sorted(spec), ['kubeconfig', 'labels', 'state'])
+
+    def test_unknown_option_selects_the_whole_spec(self):
+        self.assertEqual(self.module.supplied_argspec({'name': 'web', 'bogus': 1}), self.SPEC)
+
+    def test_extra_options_are_not_unknown(self):
+        spec = self.module.supplied_argspec({'name': 'web', 'workers': 2}, extra_argspec={'workers': {}})
+        self.assertEqual(sorted(spec), ['kubeconfig', 'name', 'state'])
+
+
+class ParamsDiffTest(unittest.TestCase):
+    def setUp(self):
+        from kubernetes.client import V1ConfigMap, V1ObjectMeta
+        from openshift.helper.ansible import KubernetesAnsibleModuleHelper
+        self.helper = KubernetesAnsibleModuleHelper('v1', 'config_map')
+        self.existing = V1ConfigMap(metadata=V1ObjectMeta(name='web', namespace='bench',
+                                                          labels={'app': 'web', 'tier': 'front'}),
+                                    data={'a': '1', 'b': '2'})
+        self.module = KubernetesAnsibleModule.__new__(KubernetesAnsibleModule)
+
+    def diff(self, **params):
+        params = dict({'name': 'web', 'namespace': 'bench', 'state': 'present', 'force': False}, **params)
+        return self.module._params_diff(self.helper, self.existing, params)
+
+    def test_params_reflected_in_the_object_are_unchanged(self):
+        self.assertEqual(self.diff(labels={'app': 'web'}, data={'b': '2'}), {})
+
+    def test_changed_params_are_returned(self):
+        self.assertEqual(self.diff(labels={'app': 'web'}, data={'a': '3'}), {'data': {'a': '3'}})
+
+    def test_params_without_a_property_path_fall_back(self):
+        class Helper(object):
+            argspec = {'name': {'property_path': ['metadata', 'name']}, 'weird': {}}
+        self.assertIsNone(self.module._params_diff(Helper(), self.existing, {'name': 'web', 'weird': 1}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,371 @@
+#
+#  Copyright 2017 Red Hat | Ansible
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+A long-lived local agent that keeps configured helpers, and with them the parsed client configuration and pooled
+connections to the API server, across module runs. Modules reach it over a Unix socket.
+
+Start it on the host where the modules execute, as the user that runs them:
+
+    python module_utils/k8s_agent.py --socket ~/.ansible/k8s_agent.sock
+
+This file must not import the other module_utils, so that it can be run on its own.
+"""
+
+import argparse
+import os
+import pickle
+import socket
+import struct
+import threading
+import time
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+AGENT_SOCKET = os.environ.get('K8S_AGENT_SOCKET', os.path.join(os.path.expanduser('~'), '.ansible', 'k8s_agent.sock'))
+
+# Helper methods that talk to the API, and are therefore run by the agent
+REMOTE_METHODS = ('set_client_config', 'get_object', 'create_object', 'replace_object', 'patch_object',
+                  'delete_object', 'create_project', 'call_api')
+
+# Connections each helper keeps open to the API server. Every module thread has its own connection to the agent, so
+# the calls of several tasks, and of the workers of a bulk task, reach a helper at the same time.
+POOL_SIZE = 10
+
+# Auth options the helper reads from a K8S_AUTH_<OPTION> environment variable, when a task does not set them
+ENV_AUTH_OPTIONS = ('api_key', 'ssl_ca_cert', 'cert_file', 'key_file', 'verify_ssl', 'kubeconfig', 'context', 'host')
+
+
+def resolve_auth(auth, environ=None):
+    """
+    Resolve the auth options a helper would otherwise fill in from the environment, from the environment of this
+    process: K8S_AUTH_* variables, and the kubeconfig in KUBECONFIG or ~/.kube/config. The agent must configure its
+    helpers from the module's environment, not its own. Without a kubeconfig file, kubeconfig is set to an empty
+    string, which the client takes to mean none.
+
+    :return: dict: a copy of auth, with every option the helper looks up in the environment set
+    """
+    environ = os.environ if environ is None else environ
+    auth = dict(auth)
+    for option in ENV_AUTH_OPTIONS:
+        if auth.get(option) is None and environ.get('K8S_AUTH_{}'.format(option.upper())) is not None:
+            auth[option] = environ['K8S_AUTH_{}'.format(option.upper())]
+    if auth.get('kubeconfig') is None:
+        path = os.path.expanduser(environ.get('KUBECONFIG') or os.path.join('~', '.kube', 'config'))
+        auth['kubeconfig'] = os.path.abspath(path) if os.path.exists(path) else ''
+    return auth
+
+
+def kubeconfig_stamp(auth):
+    """
+    Get the modification time and size of the kubeconfig files a helper is configured from, as named by auth, so
+    that a file changed in place can be detected. Missing files are left out.
+    """
+    paths = auth.get('kubeconfig') or ''
+    stamp = []
+    for path in filter(None, paths.split(os.pathsep)):
+        try:
+            stat = os.stat(os.path.expanduser(path))
+        except OSError:
+            continue
+        stamp.append((path, stat.st_mtime, stat.st_size))
+    return tuple(stamp)
+
+
+class AgentError(Exception):
+    pass
+
+
+class AgentConnectionError(AgentError):
+    pass
+
+
+def send_message(sock, message):
+    payload = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(struct.pack('>I', len(payload)) + payload)
+
+
+def _receive_exactly(sock, length):
+    chunks = []
+    while length:
+        chunk = sock.recv(length)
+        if not chunk:
+            raise AgentConnectionError('Connection to the agent closed')
+        chunks.append(chunk)
+        length -= len(chunk)
+    return b''.join(chunks)
+
+
+def receive_message(sock):
+    length = struct.unpack('>I', _receive_exactly(sock, 4))[0]
+    return pickle.loads(_receive_exactly(sock, length))
+
+
+class AgentClient(object):
+    """ Sends helper calls to the agent. Each thread uses its own connection, so calls from threads overlap. """
+
+    def __init__(self, path=AGENT_SOCKET):
+        self.path = path
+        self.local = threading.local()
+
+    @classmethod
+    def connect(cls, path=AGENT_SOCKET):
+        """ Return a client if an agent is listening on path, otherwise None """
+        if not os.path.exists(path):
+            return None
+        client = cls(path)
+        try:
+            client.socket()
+        except (IOError, OSError):
+            return None
+        return client
+
+    def socket(self):
+        if getattr(self.local, 'socket', None) is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.path)
+            self.local.socket = sock
+        return self.local.socket
+
+    def call(self, helper_key, method, *args, **kwargs):
+        """
+        Run a helper method in the agent. Exceptions raised by the helper are raised here again, rebuilt from
+        their class, message and value.
+        """
+        try:
+            send_message(self.socket(), (helper_key, method, args, kwargs))
+            response = receive_message(self.socket())
+        except (IOError, OSError, EOFError, struct.error) as exc:
+            self.local.socket = None
+            raise AgentConnectionError('Error talking to the agent at {}: {}'.format(self.path, exc))
+        if 'error' in response:
+            raise rebuild_exception(response['error'])
+        return response['result']
+
+
+def call_api(helper, operation, namespace, *args, **kwargs):
+    """
+    Call the client's API method for an operation directly, for example to page a list or to make a conditional
+    write, rather than through one of the helper's methods.
+    """
+    return helper.lookup_method(operation, namespace)(*args, **kwargs)
+
+
+def invoke(helper, method, args, kwargs):
+    """ Run one of the REMOTE_METHODS on a helper """
+    if method == 'call_api':
+        return call_api(helper, *args, **kwargs)
+    return getattr(helper, method)(*args, **kwargs)
+
+
+def describe_exception(exc):
+    """ Describe an exception raised in the agent, so that the module can raise it again """
+    error = {'type': type(exc).__name__,
+             'message': getattr(exc, 'message', None) or str(exc),
+             'value': getattr(exc, 'value', None)}
+    if error['type'] == 'ApiException':
+        error.update(status=exc.status, reason=exc.reason, body=exc.body)
+    return error
+
+
+def rebuild_exception(error):
+    """
+    Rebuild an exception raised in the agent as a local exception. Errors from the helper library, from the API,
+    and arguments the client rejected are raised again as such.
+    """
+    if error['type'] == 'ApiException':
+        from kubernetes.client.rest import ApiException
+        exc = ApiException(status=error.get('status'), reason=error.get('reason'))
+        exc.body = error.get('body')
+        return exc
+    if error['type'] == 'TypeError':
+        return TypeError(error['message'])
+    from openshift.helper import exceptions
+    exc_class = getattr(exceptions, error['type'], None)
+    if exc_class is None:
+        return AgentError(error['message'])
+    try:
+        return exc_class(error['message'], **(error.get('value') or {}))
+    except TypeError:
+        exc = exc_class(error['message'])
+        exc.value = error.get('value') or {}
+        return exc
+
+
+class AgentHelperProxy(object):
+    """
+    Stands in for a helper. Methods that talk to the API run in the agent, on a helper it keeps configured between
+    module runs. Everything else, such as argspec and object_from_params, runs on the local helper. If the agent
+    goes away, the local helper is configured and used from then on.
+    """
+
+    def __init__(self, client, helper, api_version, kind):
+        self._client = client
+        self._helper = helper
+        self._key = (type(helper).__name__, api_version, kind, ())
+        self._auth = {}
+        self._local = False
+        self._local_configured = False
+
+    def set_client_config(self, **auth):
+        # The helper key covers everything the helper is configured from, so tasks aimed at different clusters
+        # through their environment do not share a helper.
+        self._auth = resolve_auth(auth)
+        self._key = self._key[:3] + (tuple(sorted(self._auth.items())),)
+        return self._call('set_client_config', **self._auth)
+
+    def _call(self, method, *args, **kwargs):
+        if not self._local:
+            try:
+                return self._client.call(self._key, method, *args, **kwargs)
+            except AgentConnectionError:
+                self._local = True
+                self._local_configured = True
+                self._helper.set_client_config(**self._auth)
+                if method == 'set_client_config':
+                    return None
+        return invoke(self._helper, method, args, kwargs)
+
+    def local_helper(self):
+        """ Return the local helper, configured, for calls that can not be proxied, such as watch streams """
+        if not self._local_configured:
+            self._helper.set_client_config(**self._auth)
+            self._local_configured = True
+        return self._helper
+
+    def __getattr__(self, name):
+        if name in REMOTE_METHODS:
+            return lambda *args, **kwargs: self._call(name, *args, **kwargs)
+        return getattr(self._helper, name)
+
+
+class AgentState(object):
+    def __init__(self):
+        self.helpers = {}
+        self.stamps = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.last_request = time.time()
+
+    def get_helper(self, key, reconfigure=False):
+        """
+        Return the configured helper for key, creating and configuring it on first use. With reconfigure, the helper
+        is configured again if its kubeconfig changed since, for example when a token was refreshed in the file.
+        """
+        class_name, api_version, kind, auth = key
+        auth = dict(auth)
+        # Helpers are created and configured under a lock of their own, so first calls for different kinds or
+        # clusters do not wait for each other
+        with self.lock:
+            helper_lock = self.locks.setdefault(key, threading.Lock())
+        with helper_lock:
+            if key not in self.helpers:
+                from openshift.helper import ansible
+                helper = getattr(ansible, class_name)(api_version, kind)
+                self.stamps[key] = kubeconfig_stamp(auth)
+                helper.set_client_config(**auth)
+                self.size_pool(helper)
+                self.helpers[key] = helper
+            elif reconfigure:
+                stamp = kubeconfig_stamp(auth)
+                if stamp != self.stamps[key]:
+                    self.stamps[key] = stamp
+                    self.helpers[key].set_client_config(**auth)
+                    self.size_pool(self.helpers[key])
+            return self.helpers[key]
+
+    @staticmethod
+    def size_pool(helper):
+        """ Let the helper's client keep up to POOL_SIZE connections, before it makes its first request """
+        pool_manager = getattr(getattr(helper.api_client, 'rest_client', None), 'pool_manager', None)
+        if pool_manager is not None:
+            pool_manager.connection_pool_kw['maxsize'] = POOL_SIZE
+
+
+class AgentHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        state = self.server.state
+        while True:
+            try:
+                helper_key, method, args, kwargs = receive_message(self.request)
+            except (AgentConnectionError, IOError, OSError, EOFError, struct.error):
+                return
+            state.last_request = time.time()
+            try:
+                # Modules configure each helper once per run. The agent configures it when it is created, and
+                # again only if its kubeconfig has changed since.
+                helper = state.get_helper(helper_key, reconfigure=method == 'set_client_config')
+                result = None if method == 'set_client_config' else invoke(helper, method, args, kwargs)
+                response = {'result': result}
+            except Exception as exc:
+                response = {'error': describe_exception(exc)}
+            send_message(self.request, response)
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path=AGENT_SOCKET, idle_timeout=None):
+    """ Serve until interrupted, or until no request has arrived for idle_timeout seconds """
+    # Helpers are configured only from the options modules send, which include those they resolved from their own
+    # environment, never from the environment the agent was started with
+    for name in list(os.environ):
+        if name.startswith('K8S_AUTH_') or name == 'KUBECONFIG':
+            del os.environ[name]
+    if os.path.exists(path):
+        os.remove(path)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    old_umask = os.umask(0o177)
+    try:
+        server = AgentServer(path, AgentHandler)
+    finally:
+        os.umask(old_umask)
+    server.state = AgentState()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        while thread.is_alive():
+            time.sleep(1)
+            if idle_timeout and time.time() - server.state.last_request > idle_timeout:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Keep K8s module helpers and API connections warm.')
+    parser.add_argument('--socket', default=AGENT_SOCKET, help='path of the Unix socket to listen on')
+    parser.add_argument('--idle-timeout', type=float, default=None,
+                        help='exit after this many seconds without a request')
+    args = parser.parse_args()
+    serve(os.path.expanduser(args.socket), args.idle_timeout)
+
+
+if __name__ == '__main__':
+    main()
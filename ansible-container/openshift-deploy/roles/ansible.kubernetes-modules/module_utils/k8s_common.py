@@ -16,80 +16,589 @@
 # You should have received a copy of the GNU General Public License
 # along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
 import copy
+import functools
+import importlib
+import itertools
 import json
 import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
 
-from ansible.module_utils.basic import AnsibleModule
+from multiprocessing.pool import ThreadPool
 
-try:
-    from openshift.helper.ansible import KubernetesAnsibleModuleHelper, ARG_ATTRIBUTES_BLACKLIST
-    from openshift.helper.exceptions import KubernetesException
-    HAS_K8S_MODULE_HELPER = True
-except ImportError as exc:
-    HAS_K8S_MODULE_HELPER = False
-
-try:
-    import yaml
-    HAS_YAML = True
-except ImportError:
-    HAS_YAML = False
+from ansible.module_utils.basic import AnsibleModule, _load_params
+from ansible.module_utils.k8s_agent import AgentClient, AgentHelperProxy, call_api
 
 
 class KubernetesAnsibleException(Exception):
     pass
 
 
+class KubernetesAnsibleResourceException(KubernetesAnsibleException):
+    """ Raised while reconciling a single resource. Carries the keyword arguments for fail_json(). """
+
+    def __init__(self, msg, **kwargs):
+        super(KubernetesAnsibleResourceException, self).__init__(msg)
+        self.msg = msg
+        self.kwargs = kwargs
+
+    def to_result(self):
+        result = dict(self.kwargs)
+        result['msg'] = self.msg
+        return result
+
+
+class LazyImport(object):
+    """
+    Stand-in for a module that is only imported when one of its attributes is first used. The OpenShift client
+    pulls in the whole kubernetes client, so modules should not pay for it until they need it.
+    """
+
+    def __init__(self, name, missing_msg):
+        self._name = name
+        self._missing_msg = missing_msg
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            try:
+                with timings.phase('import'):
+                    self._module = importlib.import_module(self._name)
+            except ImportError:
+                raise KubernetesAnsibleException(self._missing_msg)
+        return getattr(self._module, attr)
+
+
+class DebugLog(object):
+    """
+    Write debug messages through a helper's log(), only when debug output is enabled. A message may be a
+    callable returning the text, so that serializing objects for the log is skipped entirely when debug is off.
+    The number of serializations skipped this way is counted in `skipped`.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, helper, message):
+        if self.enabled:
+            helper.log(message() if callable(message) else message)
+        elif callable(message):
+            with self._lock:
+                self.skipped += 1
+
+
+class Timings(object):
+    """
+    Wall time spent in each phase of a module run, reported with the profile option. Phases may nest, such as an
+    import triggered while the argspec is built, and time is only counted towards the innermost one, so the phases
+    never add up to more than the run took. The worker threads of a bulk request each keep their own stack of
+    phases, and their times are summed.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def reset(self):
+        with self._lock:
+            self.seconds = {}
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        stack = self._local.__dict__.setdefault('stack', [])
+        now = time.time()
+        if stack:
+            # Pause the enclosing phase
+            self.add(stack[-1][0], now - stack[-1][1])
+        stack.append([name, now])
+        try:
+            yield
+        finally:
+            name, start = stack.pop()
+            now = time.time()
+            self.add(name, now - start)
+            if stack:
+                stack[-1][1] = now
+
+    def to_result(self):
+        """ :return: dict: the seconds spent in each phase """
+        with self._lock:
+            return dict((name, round(seconds, 6)) for name, seconds in self.seconds.items())
+
+
+timings = Timings()
+
+
+def timed(name):
+    """ Decorate a function, so that the time spent in it is counted towards phase `name` """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timings.phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+OPENSHIFT_MISSING_MSG = "This module requires the OpenShift Python client. Try `pip install openshift`"
+
+openshift = LazyImport('openshift', OPENSHIFT_MISSING_MSG)
+helper_ansible = LazyImport('openshift.helper.ansible', OPENSHIFT_MISSING_MSG)
+helper_exceptions = LazyImport('openshift.helper.exceptions', OPENSHIFT_MISSING_MSG)
+kubernetes_client = LazyImport('kubernetes.client', OPENSHIFT_MISSING_MSG)
+kubernetes_rest = LazyImport('kubernetes.client.rest', OPENSHIFT_MISSING_MSG)
+kubernetes_watch = LazyImport('kubernetes.watch', OPENSHIFT_MISSING_MSG)
+yaml = LazyImport('yaml', "This module requires PyYAML. Try `pip install PyYAML`")
+
+
+# Module parameters copied from the task onto each resource of a bulk request
+BULK_SHARED_PARAMS = ('state', 'force', 'debug', 'diff_engine', 'wait', 'wait_timeout', 'return_mode', 'return_fields',
+                      'conflict_retries', 'teardown')
+
+# Bump when the layout of the cached argspec changes
+ARGSPEC_CACHE_VERSION = 10
+ARGSPEC_CACHE_DIR = os.environ.get('K8S_ARGSPEC_CACHE_DIR',
+                                   os.path.join(os.path.expanduser('~'), '.ansible', 'cache', 'k8s_argspec'))
+
+# The metadata folder pip or setuptools installs next to the OpenShift client, which carries its version
+CLIENT_METADATA = re.compile(r'^openshift-(\d[^-]*?)(-py\d[\d.]*)?\.(dist-info|egg-info)$')
+
+# Options added to the argspec of the generic k8s_resource module, which selects the helper at run time
+RESOURCE_MODULE_ARGSPEC = {
+    'kind': {'type': 'str'},
+    'api_version': {'type': 'str'},
+}
+
+# Options that control the module, rather than describe the object. The params diff engine skips them.
+CONTROL_PARAMS = ('state', 'force', 'debug', 'src', 'resource_definition', 'resource_definitions', 'workers',
+                  'diff_engine', 'wait', 'wait_timeout', 'return_mode', 'return_fields', 'conflict_retries', 'teardown',
+                  'profile', 'kind', 'api_version')
+
+# Seconds to back off after the first conflicting update, doubling with each retry up to the maximum. A random
+# fraction of the delay is used, so that competing writers do not retry in lockstep.
+CONFLICT_BACKOFF = 0.1
+CONFLICT_BACKOFF_MAX = 5.0
+
+# Options of list modules, mapped to the keyword arguments of the client's list methods
+LIST_QUERY_PARAMS = (
+    ('label_selector', 'label_selector'),
+    ('field_selector', 'field_selector'),
+    ('limit', 'limit'),
+    ('continue', '_continue'),
+)
+
+# The fields returned for each object with return_mode: minimal, as (key, ...) paths into to_dict()
+MINIMAL_RETURN_FIELDS = (
+    ('api_version',),
+    ('kind',),
+    ('metadata', 'name'),
+    ('metadata', 'namespace'),
+    ('metadata', 'uid'),
+    ('metadata', 'resource_version'),
+    ('metadata', 'generation'),
+)
+
+# Kinds that contain other objects, and are therefore reconciled before everything else in a bulk request
+BULK_CONTAINER_KINDS = ('namespace', 'project')
+
+# The (apiVersion, kind) of objects deleted in parallel, ahead of the namespace holding them, by teardown. They are
+# mapped to the helpers of the installed client with to_helper_args().
+TEARDOWN_KINDS = (
+    ('extensions/v1beta1', 'Deployment'),
+    ('extensions/v1beta1', 'DaemonSet'),
+    ('apps/v1beta1', 'StatefulSet'),
+    ('extensions/v1beta1', 'ReplicaSet'),
+    ('v1', 'ReplicationController'),
+    ('batch/v1', 'Job'),
+    ('v1', 'Pod'),
+    ('v1', 'Service'),
+    ('v1', 'ConfigMap'),
+    ('v1', 'Secret'),
+    ('v1', 'PersistentVolumeClaim'),
+)
+
+
+def camel_to_snake(name):
+    """ Convert a camelCase or CamelCase name to snake_case """
+    return re.sub('([a-z0-9])([A-Z])', r'\1_\2', re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)).lower()
+
+
+def to_helper_args(api_version, kind):
+    """
+    Map an apiVersion and kind, as found in a resource definition, to the (api_version, kind) arguments expected
+    by the helper. For example, extensions/v1beta1 and DaemonSet map to ('V1beta1', 'daemon_set'). Where the
+    installed client only has a model of the kind for each API group, the group is kept: from kubernetes 3.0.0
+    on, apps/v1beta1 and Deployment map to ('AppsV1beta1', 'deployment').
+    """
+    group, _, version = api_version.rpartition('/')
+    version = version[:1].upper() + version[1:]
+    kind = camel_to_snake(kind)
+    model_name = ''.join(word.capitalize() for word in kind.split('_'))
+    if group and not hasattr(kubernetes_client, version + model_name):
+        group_version = ''.join(word.capitalize() for word in group.replace('.k8s.io', '').split('.')) + version
+        if hasattr(kubernetes_client, group_version + model_name):
+            return group_version, kind
+    return version, kind
+
+
+def value_contained(requested, current):
+    """
+    Check whether a requested param value is already reflected in the current value of the object, using the
+    same merge semantics as a patch: dicts must contain the requested keys, and lists must contain an item
+    matching each requested item. Models are compared through to_dict(), and requested keys may be in camelCase
+    or snake_case.
+    """
+    if requested is None:
+        return True
+    if hasattr(current, 'to_dict'):
+        current = current.to_dict()
+    if isinstance(requested, dict):
+        if not isinstance(current, dict):
+            return False
+        for key, value in requested.items():
+            if key in current:
+                current_value = current[key]
+            else:
+                current_value = current.get(camel_to_snake(key))
+            if not value_contained(value, current_value):
+                return False
+        return True
+    if isinstance(requested, list):
+        if not isinstance(current, list):
+            return False
+        # Convert the current items once, rather than for every requested item they are compared with. Items are
+        # usually listed in the same order as requested, so the item at the same position is tried first.
+        current = [to_plain(item) for item in current]
+        return all(
+            (index < len(current) and value_contained(item, current[index])) or
+            any(value_contained(item, current_item) for current_item in current)
+            for index, item in enumerate(requested)
+        )
+    return requested == current or str(requested) == str(current)
+
+
+def significant_changes(diff):
+    """
+    Drop the changes between a number and the same number as a string from a dictdiffer diff, as made by
+    objects_match(). The client types int-or-string fields, such as the targetPort of a service port, as strings, so
+    a number read back from the API never equals the same number requested.
+    """
+    def representation_only(change):
+        if change[0] != 'change':
+            return False
+        old, new = change[2]
+        if isinstance(old, bool) or isinstance(new, bool) or isinstance(old, int) == isinstance(new, int):
+            return False
+        return str(old) == str(new)
+    return [change for change in diff if not representation_only(change)]
+
+
+def size_connection_pool(helper, size):
+    """
+    Let the helper's API client keep up to size connections open to the API server. Its pool holds one by default,
+    so when workers share the helper, every other connection in use at the same time is closed after its request,
+    rather than reused. Only pools created afterwards are affected, so this is done before the first request. Helpers
+    proxied through the agent are left alone, as their requests are made by the agent.
+    """
+    if hasattr(helper, 'local_helper'):
+        return
+    rest_client = getattr(getattr(helper, 'api_client', None), 'rest_client', None)
+    pool_manager = getattr(rest_client, 'pool_manager', None)
+    if pool_manager is not None and pool_manager.connection_pool_kw.get('maxsize', 1) < size:
+        pool_manager.connection_pool_kw['maxsize'] = size
+
+
+def helper_params(helper, params):
+    """
+    Pick the params the helper knows from the module params. The helper fails on any param missing from its
+    argspec, such as the options this module adds to it, so only these are passed to it.
+    """
+    return dict((key, value) for key, value in params.items() if key in helper.argspec)
+
+
+def property_value(obj, property_path):
+    """ Follow a param's property_path through a model, returning None if any attribute along it is unset """
+    for attribute in property_path:
+        obj = getattr(obj, attribute, None)
+        if obj is None:
+            break
+    return obj
+
+
+def to_plain(value):
+    """ Convert models, and lists and dicts of models, to plain values that can be returned in a result """
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [to_plain(item) for item in value]
+    if isinstance(value, dict):
+        return dict((key, to_plain(item)) for key, item in value.items())
+    return value
+
+
+def rollout_complete(obj):
+    """
+    Check the rollout status of a deployment, deployment config, or any other object that manages replicas.
+
+    :return: bool: True once the latest spec has been observed, and all replicas are updated and available.
+             None if the object has no replicas to roll out.
+    """
+    spec = getattr(obj, 'spec', None)
+    if spec is None or not hasattr(spec, 'replicas'):
+        return None
+    desired = spec.replicas if spec.replicas is not None else 1
+    status = obj.status
+    if status is None:
+        return False
+    generation = obj.metadata.generation
+    if generation is not None and (status.observed_generation or 0) < generation:
+        return False
+    return ((status.updated_replicas or 0) >= desired and (status.available_replicas or 0) >= desired and
+            (status.replicas or 0) <= desired)
+
+
+def parse_fields(fields):
+    """
+    Split dotted field paths, such as metadata.name or status.podIP, into tuples of the snake_case keys used by
+    to_dict().
+    """
+    return [tuple(camel_to_snake(part) for part in field.split('.')) for field in fields or []]
+
+
+def project_fields(obj, fields):
+    """
+    Return a new dict holding only the given fields of obj. Fields are tuples, as returned by parse_fields(). Fields
+    missing from obj are left out.
+    """
+    result = {}
+    for field in fields:
+        value = obj
+        for key in field:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            target = result
+            for key in field[:-1]:
+                target = target.setdefault(key, {})
+            target[field[-1]] = value
+    return result
+
+
+def client_version():
+    """
+    Get the version of the installed OpenShift client from its package metadata, without importing the client,
+    which pulls in the whole kubernetes client. Falls back to importing it when no metadata is found, for example
+    in a source checkout.
+
+    :return: str: the version, or None if it is unknown
+    """
+    for path in sys.path:
+        try:
+            names = os.listdir(path or os.curdir)
+        except OSError:
+            continue
+        for name in names:
+            match = CLIENT_METADATA.match(name)
+            if match:
+                return match.group(1)
+    try:
+        return getattr(openshift, '__version__', None)
+    except KubernetesAnsibleException:
+        return None
+
+
+def api_error_message(exc):
+    """ Get the message of the Status carried in the body of an ApiException, falling back to its reason """
+    try:
+        return json.loads(exc.body).get('message') or exc.reason
+    except (AttributeError, TypeError, ValueError):
+        return exc.reason
+
+
+def accepts_argument(method, arg_name):
+    """
+    Check whether a method of the generated API client accepts a keyword argument. The methods take **kwargs, and
+    raise TypeError on any they do not know, but their docstrings list the arguments they accept. Older clients,
+    for example, do not page lists with limit and continue.
+    """
+    return re.search(r':param \S+ {}:'.format(re.escape(arg_name)), method.__doc__ or '') is not None
+
+
+def compile_argspec(spec):
+    """
+    Compile an argspec into a lookup table, so that only the options supplied to a module need to be validated.
+    `always` lists the options validated on every run, because they have a default or are required, and `aliases`
+    maps each alias to its option.
+    """
+    always = sorted(name for name, options in spec.items()
+                    if options.get('default') is not None or options.get('required'))
+    aliases = dict((alias, name) for name, options in spec.items() for alias in options.get('aliases') or [])
+    return {'spec': spec, 'always': always, 'aliases': aliases}
+
+
+def iter_yaml_documents(path):
+    """
+    Yield the documents of a YAML file one at a time, skipping empty ones. Uses the LibYAML based loader when
+    PyYAML was built with it.
+    """
+    loader = getattr(yaml, 'CSafeLoader', None) or yaml.SafeLoader
+    with open(path, 'r') as f:
+        for document in yaml.load_all(f, Loader=loader):
+            if document is not None:
+                yield document
+
+
 class KubernetesAnsibleModule(AnsibleModule):
+    teardown_kinds = TEARDOWN_KINDS
+
     @staticmethod
     def get_helper(api_version, kind):
-        return KubernetesAnsibleModuleHelper(api_version, kind)
+        return helper_ansible.KubernetesAnsibleModuleHelper(api_version, kind)
 
-    def __init__(self, kind, api_version):
+    def __init__(self, kind, api_version, extra_argspec=None):
+        timings.reset()
+        self.timings = timings
         self.api_version = api_version
         self.kind = kind
         self.argspec_cache = None
+        self.auth_options = None
+        self.helper_cache = {}
+        self.helper_lock = threading.Lock()
+        self.debug_log = DebugLog()
+        self.snake_cache = {}
+        self.param_prefix_cache = {}
+        self.agent = AgentClient.connect()
 
-        if not HAS_K8S_MODULE_HELPER:
-            raise KubernetesAnsibleException(
-                "This module requires the OpenShift Python client. Try `pip install openshift`"
-            )
+        mutually_exclusive = (
+            ('resource_definition', 'src'),
+            ('resource_definitions', 'src'),
+            ('resource_definitions', 'resource_definition'),
+        )
 
-        if not HAS_YAML:
-            raise KubernetesAnsibleException(
-                "This module requires PyYAML. Try `pip install PyYAML`"
-            )
+        with timings.phase('argspec'):
+            argument_spec = dict(self.supplied_argspec(_load_params(), extra_argspec), **(extra_argspec or {}))
 
-        try:
-            self.helper = self.get_helper(api_version, kind)
-        except Exception as exc:
+            AnsibleModule.__init__(self,
+                                   argument_spec=argument_spec,
+                                   supports_check_mode=True,
+                                   mutually_exclusive=mutually_exclusive)
+
+    @classmethod
+    def for_resource(cls):
+        """
+        Construct the module for a task of the generic k8s_resource module. The helper is selected by the kind
+        and api_version options, or inferred from the apiVersion and kind of the first resource definition, taken
+        from resource_definition, resource_definitions or src, in that order.
+        """
+        params = _load_params()
+        kind = params.get('kind')
+        api_version = params.get('api_version')
+        if not kind or not api_version:
+            definition = params.get('resource_definition') or (params.get('resource_definitions') or [None])[0]
+            if definition is None and params.get('src'):
+                try:
+                    definition = next(iter_yaml_documents(os.path.normpath(params['src'])), None)
+                except (IOError, yaml.YAMLError) as exc:
+                    raise KubernetesAnsibleException("Error loading resource_definition: {}".format(exc))
+            if not isinstance(definition, dict):
+                definition = {}
+            kind = kind or definition.get('kind')
+            api_version = api_version or definition.get('apiVersion')
+        if not kind or not api_version:
             raise KubernetesAnsibleException(
-                "Error initializing AnsibleModuleHelper: {}".format(exc)
+                "Unable to determine the resource type. Provide kind and api_version, or a resource definition "
+                "that includes them."
             )
+        api_version, kind = to_helper_args(api_version, kind)
+        return cls(kind, api_version, extra_argspec=RESOURCE_MODULE_ARGSPEC)
 
-        mutually_exclusive = (
-            ('resource_definition', 'src'),
-        )
+    @property
+    def helper(self):
+        """
+        The helper for the module's own api_version and kind. It is created on first use, so that a module whose
+        argspec is cached does not import the OpenShift client until it talks to the API.
+        """
+        if (self.api_version, self.kind) not in self.helper_cache:
+            try:
+                self.helper_cache[(self.api_version, self.kind)] = self.new_helper(self.api_version, self.kind)
+            except KubernetesAnsibleException:
+                raise
+            except Exception as exc:
+                raise KubernetesAnsibleException(
+                    "Error initializing AnsibleModuleHelper: {}".format(exc)
+                )
+        return self.helper_cache[(self.api_version, self.kind)]
 
-        AnsibleModule.__init__(self,
-                               argument_spec=self.argspec,
-                               supports_check_mode=True,
-                               mutually_exclusive=mutually_exclusive)
+    @timed('helper_init')
+    def new_helper(self, api_version, kind):
+        """ Create a helper. When a local agent is running, calls to the API are proxied through it. """
+        helper = self.get_helper(api_version, kind)
+        if self.agent is not None:
+            helper = AgentHelperProxy(self.agent, helper, api_version, kind)
+        return helper
 
     @property
     def argspec(self):
         """
-        Build the module argument spec from the helper.argspec, removing any extra attributes not needed by
-        Ansible.
+        The module argument spec, built from the helper.argspec
 
         :return: dict: a valid Ansible argument spec
         """
+        return self.argspec_table['spec']
+
+    def supplied_argspec(self, params, extra_argspec=None):
+        """
+        Pick the options AnsibleModule needs to validate params from the argspec: those supplied, and those with a
+        default or required. Large kinds have thousands of options, of which a task only sets a few, so this saves
+        AnsibleModule from checking every one of them on every run. If any option is unknown, the whole spec is
+        returned, so that AnsibleModule reports it as unsupported along with the full list of supported options.
+
+        :return: dict: a valid Ansible argument spec
+        """
+        table = self.argspec_table
+        spec = table['spec']
+        names = set(table['always'])
+        for name in params:
+            if name.startswith('_ansible_'):
+                continue
+            name = table['aliases'].get(name, name)
+            if name not in spec and name not in (extra_argspec or {}):
+                return spec
+            names.add(name)
+        return dict((name, spec[name]) for name in names if name in spec)
+
+    @property
+    @timed('argspec')
+    def argspec_table(self):
+        """
+        Build the module argument spec from the helper.argspec, removing any extra attributes not needed by
+        Ansible, and compile it with compile_argspec(). The result is cached on disk, so it is only built once per
+        client version, api_version and kind.
+
+        :return: dict: the compiled argspec
+        """
+        if not self.argspec_cache:
+            self.argspec_cache = self._load_argspec_cache()
         if not self.argspec_cache:
             spec = {}
             for arg_name, arg_properties in self.helper.argspec.items():
                 spec[arg_name] = {}
                 for option, option_value in arg_properties.items():
-                    if option not in ARG_ATTRIBUTES_BLACKLIST:
+                    if option not in helper_ansible.ARG_ATTRIBUTES_BLACKLIST:
                         if option == 'choices':
                             if isinstance(option_value, dict):
                                 spec[arg_name]['choices'] = [value for key, value in option_value.items()]
@@ -97,10 +606,90 @@ class KubernetesAnsibleModule(AnsibleModule):
                                 spec[arg_name]['choices'] = option_value
                         else:
                             spec[arg_name][option] = option_value
+            if 'resource_definition' in spec:
+                spec['resource_definitions'] = {'type': 'list'}
+                spec['workers'] = {'type': 'int', 'default': 4}
+            is_list = self.helper.base_model_name_snake.endswith('list')
+            if 'state' in spec and not is_list:
+                spec['diff_engine'] = {'type': 'str', 'default': 'object', 'choices': ['object', 'params']}
+                spec['wait'] = {'type': 'bool', 'default': False}
+                spec['wait_timeout'] = {'type': 'int', 'default': 120}
+                spec['conflict_retries'] = {'type': 'int', 'default': 5}
+                spec['teardown'] = {'type': 'bool', 'default': False}
+            if is_list:
+                # Some client versions leave namespace out of the list argspec
+                spec.setdefault('namespace', {'type': 'str'})
+                for param_name, _ in LIST_QUERY_PARAMS:
+                    spec[param_name] = {'type': 'int' if param_name == 'limit' else 'str'}
+                spec['all_pages'] = {'type': 'bool', 'default': True}
+            spec['return_mode'] = {'type': 'str', 'default': 'full', 'choices': ['full', 'minimal', 'none']}
+            spec['return_fields'] = {'type': 'list'}
+            spec['profile'] = {'type': 'bool', 'default': False}
 
-            self.argspec_cache = spec
+            self.argspec_cache = compile_argspec(spec)
+            self._save_argspec_cache(self.argspec_cache)
         return self.argspec_cache
 
+    @property
+    def argspec_cache_path(self):
+        """ Path of the on-disk argspec cache. The client version is part of the name, so upgrades invalidate it. """
+        filename = '{}-{}-{}-{}.json'.format(type(self).__name__, self.api_version, self.kind, ARGSPEC_CACHE_VERSION)
+        return os.path.join(ARGSPEC_CACHE_DIR, client_version() or 'unknown', filename)
+
+    def _load_argspec_cache(self):
+        """ Return the cached compiled argspec, or None if it does not exist or cannot be read """
+        try:
+            with open(self.argspec_cache_path, 'r') as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _save_argspec_cache(self, table):
+        """ Write the argspec cache atomically. Failure only costs a rebuild on the next run. """
+        path = self.argspec_cache_path
+        tmp_path = None
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(table, f)
+            os.rename(tmp_path, path)
+        except (IOError, OSError, TypeError, ValueError):
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def exit_json(self, **kwargs):
+        """ With the profile option, add the profile of the run to the result """
+        if self.params.get('profile'):
+            self.add_profile(kwargs)
+        AnsibleModule.exit_json(self, **kwargs)
+
+    def fail_json(self, **kwargs):
+        if getattr(self, 'params', None) and self.params.get('profile'):
+            self.add_profile(kwargs)
+        AnsibleModule.fail_json(self, **kwargs)
+
+    def add_profile(self, result):
+        """
+        Add the time spent in each phase of the run to the result as `timings`, and the number of debug log
+        serializations skipped because debug is off as `debug_serializations_skipped`.
+        """
+        result['debug_serializations_skipped'] = self.debug_log.skipped
+        result['timings'] = self.profile_timings(result)
+
+    def profile_timings(self, result):
+        """
+        Time the serialization of the result, which AnsibleModule does on exit, and return the seconds spent in
+        each phase of the run.
+
+        :return: dict: seconds by phase, such as import, helper_init, argspec, client_config, get, diff, write,
+                 wait and serialize
+        """
+        with timings.phase('serialize'):
+            json.dumps(result, default=str)
+        return timings.to_result()
+
     def execute_module(self):
         """
         Performs basic CRUD operations on the model object. Ends by calling
@@ -109,159 +698,776 @@ class KubernetesAnsibleModule(AnsibleModule):
           changed: boolean
           api_version: the API version
           <kind>: a dict representing the object's state
+
+        When more than one resource is requested, through resource_definitions or a multi-document src file,
+        each one is reconciled, and the dict contains:
+          changed: boolean
+          results: a list of the per-resource dicts described above
         :return: None
         """
 
         if self.params.get('debug'):
+            self.debug_log.enabled = True
             self.helper.enable_debug(reset_logfile=False)
             self.helper.log_argspec()
 
-        resource_definition = self.params.get('resource_definition')
+        resource_definitions = self.params.get('resource_definitions')
         if self.params.get('src'):
-            resource_definition = self.load_resource_definition(self.params['src'])
-        if resource_definition:
-            resource_params = self.resource_to_parameters(resource_definition)
-            self.params.update(resource_params)
-
-        state = self.params.get('state', None)
-        force = self.params.get('force', False)
-        name = self.params.get('name')
-        namespace = self.params.get('namespace', None)
-        existing = None
-
-        return_attributes = dict(changed=False, api_version=self.api_version)
-        return_attributes[self.helper.base_model_name_snake] = {}
+            documents = self.iter_resource_definitions(self.params['src'])
+            try:
+                head = list(itertools.islice(documents, 2))
+            except KubernetesAnsibleResourceException as exc:
+                self.fail_json(**exc.to_result())
+            if len(head) == 1:
+                self.params['resource_definition'] = head[0]
+            else:
+                # Leave the rest of the file to be read as the resources are reconciled
+                resource_definitions = itertools.chain(head, documents)
 
         try:
-            auth_options = {}
+            self.auth_options = {}
             for key, value in self.helper.argspec.items():
                 if value.get('auth_option') and self.params.get(key) is not None:
-                    auth_options[key] = self.params[key]
-            self.helper.set_client_config(**auth_options)
-        except KubernetesException as e:
+                    self.auth_options[key] = self.params[key]
+            with timings.phase('client_config'):
+                self.helper.set_client_config(**self.auth_options)
+            size_connection_pool(self.helper, self.workers)
+        except helper_exceptions.KubernetesException as e:
             self.fail_json(msg='Error loading config', error=str(e))
 
+        if resource_definitions is not None:
+            self._execute_bulk(resource_definitions)
+
+        try:
+            resource_definition = self.params.get('resource_definition')
+            if resource_definition:
+                resource_params = self.resource_to_parameters(resource_definition)
+                self.params.update(resource_params)
+            return_attributes = self._reconcile(self.helper, self.api_version, self.kind, self.params)
+        except KubernetesAnsibleResourceException as exc:
+            self.fail_json(**exc.to_result())
+        self.exit_json(**return_attributes)
+
+    def _execute_bulk(self, resource_definitions):
+        """
+        Reconcile each resource definition using the helper matching its apiVersion and kind. Helpers, and
+        their client configuration, are shared by all resources of the same kind. Ends by calling
+        AnsibleModule.exit_json(), or AnsibleModule.fail_json() if any resource failed.
+
+        resource_definitions may be a list or any iterable, such as the documents of a src file as they are read.
+        Resources are handed to up to `workers` threads, and at most twice that many are held in memory waiting
+        for a thread. A namespace or project waits for everything before it, and everything after it waits for
+        the namespace, so files must list namespaces ahead of their contents. A list is reordered to put them
+        first. When state is absent, namespaces and projects are instead removed after everything else, unless a src
+        file cannot be read to the end, in which case they are reported as failed.
+        """
+        absent = self.params.get('state') == 'absent'
+        workers = self.workers
+        indexed_definitions = enumerate(resource_definitions)
+        if isinstance(resource_definitions, list) and not absent:
+            indexed_definitions = sorted(indexed_definitions,
+                                         key=lambda item: self._definition_kind(item[1]) not in BULK_CONTAINER_KINDS)
+
+        results = {}
+        pending = []
+        deferred = []
+
+        def collect(limit):
+            while len(pending) > limit:
+                index, result = pending.pop(0).get()
+                results[index] = result
+
+        pool = ThreadPool(workers)
+        try:
+            for index, definition in indexed_definitions:
+                try:
+                    request = self._prepare_definition(definition)
+                except KubernetesAnsibleResourceException as exc:
+                    results[index] = self._failed_result(exc)
+                    continue
+                if request[1] not in BULK_CONTAINER_KINDS:
+                    pending.append(pool.apply_async(self._reconcile_request, ((index, request),)))
+                    collect(2 * workers)
+                elif absent:
+                    deferred.append((index, request))
+                else:
+                    collect(0)
+                    results[index] = self._reconcile_request((index, request))[1]
+            collect(0)
+            for index, result in pool.map(self._reconcile_request, deferred):
+                results[index] = result
+        except KubernetesAnsibleResourceException as exc:
+            # The src file could not be read to the end. The namespaces and projects waiting to be removed are left
+            # in place, and reported as failed, rather than removed with all they hold on the strength of part of
+            # the file.
+            collect(0)
+            error_index = len(results) + len(deferred)
+            for index, (api_version, kind, helper, params) in deferred:
+                results[index] = {'failed': True, 'changed': False, 'kind': kind,
+                                  'msg': "Not removed, as the src file could not be read to the end"}
+            results[error_index] = self._failed_result(exc)
+        finally:
+            pool.close()
+
+        results = [results[index] for index in sorted(results)]
+        changed = any(result.get('changed') for result in results)
+        failed = [result for result in results if result.get('failed')]
+        if failed:
+            self.fail_json(msg="Failed to reconcile {} of {} resources".format(len(failed), len(results)),
+                           changed=changed, results=results)
+        self.exit_json(changed=changed, results=results)
+
+    @staticmethod
+    def _definition_kind(definition):
+        """ The snake_case kind of a resource definition, or None """
+        if isinstance(definition, dict) and definition.get('kind'):
+            return camel_to_snake(definition['kind'])
+        return None
+
+    def _prepare_definition(self, definition):
+        """
+        Build the helper and parameters for a single resource definition.
+
+        :return: tuple: (api_version, kind, helper, params)
+        """
+        if not isinstance(definition, dict):
+            raise KubernetesAnsibleResourceException(
+                "Error parsing resource definitions. Expected a dict, found {}".format(type(definition).__name__)
+            )
+        api_version, kind = self.definition_to_helper_args(definition)
+        helper = self.get_resource_helper(api_version, kind)
+
+        params = dict((key, value.get('default')) for key, value in helper.argspec.items())
+        params.update(self.auth_options)
+        for key in BULK_SHARED_PARAMS:
+            if self.params.get(key) is not None:
+                params[key] = self.params[key]
+        params.update(self.resource_to_parameters(definition, helper=helper))
+        return api_version, kind, helper, params
+
+    def _reconcile_request(self, indexed_request):
+        """ Reconcile a prepared request on a worker thread, returning (index, result) """
+        index, (api_version, kind, helper, params) = indexed_request
+        try:
+            result = self._reconcile(helper, api_version, kind, params)
+        except KubernetesAnsibleResourceException as exc:
+            result = self._failed_result(exc)
+        result['kind'] = kind
+        return index, result
+
+    @staticmethod
+    def _failed_result(exc):
+        result = exc.to_result()
+        result['failed'] = True
+        return result
+
+    def definition_to_helper_args(self, definition):
+        """ Derive the helper (api_version, kind) arguments from a resource definition """
+        api_version = definition.get('apiVersion')
+        kind = definition.get('kind')
+        if not api_version or not kind:
+            raise KubernetesAnsibleResourceException(
+                "Error parsing resource definitions. Each definition requires apiVersion and kind."
+            )
+        return to_helper_args(api_version, kind)
+
+    def get_resource_helper(self, api_version, kind):
+        """
+        Return a configured helper for the requested api_version and kind, creating it on first use. Workers share
+        the helpers, so only one of them creates each. Creating a helper is mostly CPU bound, so a single lock
+        costs the workers little.
+        """
+        with self.helper_lock:
+            if (api_version, kind) not in self.helper_cache:
+                try:
+                    helper = self.new_helper(api_version, kind)
+                except Exception as exc:
+                    raise KubernetesAnsibleResourceException(
+                        "Error initializing AnsibleModuleHelper for {} {}: {}".format(api_version, kind, exc)
+                    )
+                if self.params.get('debug'):
+                    helper.enable_debug(reset_logfile=False)
+                try:
+                    with timings.phase('client_config'):
+                        helper.set_client_config(**self.auth_options)
+                except helper_exceptions.KubernetesException as exc:
+                    raise KubernetesAnsibleResourceException('Error loading config', error=str(exc))
+                size_connection_pool(helper, self.workers)
+                self.helper_cache[(api_version, kind)] = helper
+            return self.helper_cache[(api_version, kind)]
+
+    def _reconcile(self, helper, api_version, kind, params):
+        """
+        Bring a single object in line with the requested params, and when requested, wait for its rollout to
+        complete, or for it to be removed. Raises KubernetesAnsibleResourceException, if an error is encountered.
+
+        :return: dict: the return attributes for the object
+        """
+        return_attributes = self._apply(helper, api_version, kind, params)
+        if params.get('wait') and not self.check_mode:
+            if params.get('state') == 'present':
+                k8s_obj = self._wait_for_rollout(helper, kind, params)
+                if k8s_obj is not None:
+                    return_attributes[kind] = k8s_obj.to_dict()
+            elif params.get('state') == 'absent':
+                self._wait_for_deletion(helper, kind, params)
+        if params.get('return_mode') == 'none':
+            return_attributes[kind] = {}
+        elif not helper.base_model_name_snake.endswith('list'):
+            # List items are trimmed as each page is read
+            fields = self.return_fields(params)
+            if fields and return_attributes.get(kind):
+                return_attributes[kind] = project_fields(return_attributes[kind], fields)
+        return return_attributes
+
+    @staticmethod
+    def return_fields(params):
+        """
+        Get the fields to keep of each returned object, from the return_fields and return_mode params
+
+        :return: list: (key, ...) paths, or None to return whole objects
+        """
+        if params.get('return_fields'):
+            return parse_fields(params['return_fields'])
+        if params.get('return_mode') == 'minimal':
+            return MINIMAL_RETURN_FIELDS
+        return None
+
+    def _apply(self, helper, api_version, kind, params):
+        """ Create, patch, replace or delete the object, returning the return attributes """
+        state = params.get('state', None)
+        name = params.get('name')
+        namespace = params.get('namespace', None)
+        existing = None
+
+        return_attributes = dict(changed=False, api_version=api_version)
+        return_attributes[helper.base_model_name_snake] = {}
+
+        if helper.base_model_name_snake.endswith('list'):
+            # For list modules, execute a GET for each page, and exit. Some client versions give them a state param,
+            # which is ignored.
+            return_attributes[kind] = self._list(helper, namespace, params)
+            return return_attributes
+
         if state is None:
-            # This is a list, rollback or ? module with no 'state' param
-            if self.helper.base_model_name_snake.endswith('list'):
-                # For list modules, execute a GET, and exit
-                k8s_obj = self._read(name, namespace)
-                return_attributes[self.kind] = k8s_obj.to_dict()
-                self.exit_json(**return_attributes)
-            elif self.helper.has_method('create'):
+            # This is a rollback or ? module with no 'state' param
+            if helper.has_method('create'):
                 # For a rollback, execute a POST, and exit
-                k8s_obj = self._create(namespace)
-                return_attributes[self.kind] = k8s_obj.to_dict()
+                k8s_obj = self._create(helper, kind, params)
+                return_attributes[kind] = k8s_obj.to_dict() if k8s_obj is not None else {}
                 return_attributes['changed'] = True
-                self.exit_json(**return_attributes)
+                return return_attributes
             else:
-                self.fail_json(msg="Missing state parameter. Expected one of: present, absent")
+                raise KubernetesAnsibleResourceException(
+                    "Missing state parameter. Expected one of: present, absent"
+                )
 
         # CRUD modules
         try:
-            existing = self.helper.get_object(name, namespace)
-        except KubernetesException as exc:
-            self.fail_json(msg='Failed to retrieve requested object: {}'.format(exc.message),
-                           error=exc.value.get('status'))
+            with timings.phase('get'):
+                existing = helper.get_object(name, namespace)
+        except helper_exceptions.KubernetesException as exc:
+            raise KubernetesAnsibleResourceException(
+                'Failed to retrieve requested object: {}'.format(exc.message),
+                error=exc.value.get('status')
+            )
 
         if state == 'absent':
             if not existing:
                 # The object already does not exist
-                self.exit_json(**return_attributes)
+                return return_attributes
             else:
                 # Delete the object
                 if not self.check_mode:
+                    if params.get('teardown') and kind in BULK_CONTAINER_KINDS:
+                        self._delete_contents(name)
                     try:
-                        self.helper.delete_object(name, namespace)
-                    except KubernetesException as exc:
-                        self.fail_json(msg="Failed to delete object: {}".format(exc.message),
-                                       error=exc.value.get('status'))
+                        with timings.phase('write'):
+                            helper.delete_object(name, namespace)
+                    except helper_exceptions.KubernetesException as exc:
+                        raise KubernetesAnsibleResourceException(
+                            "Failed to delete object: {}".format(exc.message),
+                            error=exc.value.get('status')
+                        )
                 return_attributes['changed'] = True
-                self.exit_json(**return_attributes)
+                return return_attributes
         else:
-            if not existing:
-                k8s_obj = self._create(namespace)
-                return_attributes[self.kind] = k8s_obj.to_dict()
-                return_attributes['changed'] = True
-                self.exit_json(**return_attributes)
+            if self.check_mode:
+                return self._dry_run(helper, kind, existing, params, return_attributes)
 
-            if existing and force:
-                k8s_obj = None
-                request_body = self.helper.request_body_from_params(self.params)
-                if not self.check_mode:
-                    try:
-                        k8s_obj = self.helper.replace_object(name, namespace, body=request_body)
-                    except KubernetesException as exc:
-                        self.fail_json(msg="Failed to replace object: {}".format(exc.message),
-                                       error=exc.value.get('status'))
-                return_attributes[self.kind] = k8s_obj.to_dict()
-                return_attributes['changed'] = True
-                self.exit_json(**return_attributes)
+            return self._write_with_retry(helper, kind, existing, params, return_attributes)
 
-            # Check if existing object should be patched
-            k8s_obj = copy.deepcopy(existing)
+    def _delete_contents(self, namespace):
+        """
+        Delete the objects of each of the teardown_kinds in a namespace or project, up to `workers` at a time. The
+        deletes propagate in the background, so pods and other dependents are removed by the garbage collector
+        concurrently, rather than one at a time by the namespace controller once the namespace is deleted.
+
+        Kinds the installed client has no model or API for are skipped with a warning, and left to the namespace
+        controller.
+        """
+        requests = []
+        for definition_api_version, definition_kind in self.teardown_kinds:
+            api_version, kind = to_helper_args(definition_api_version, definition_kind)
             try:
-                self.helper.object_from_params(self.params, obj=k8s_obj)
-            except KubernetesException as exc:
-                self.fail_json(msg="Failed to patch object: {}".format(exc.message))
-            match, diff = self.helper.objects_match(existing, k8s_obj)
-            if match:
-                return_attributes[self.kind] = existing.to_dict()
-                self.exit_json(**return_attributes)
-            else:
-                self.helper.log('Existing:')
-                self.helper.log(json.dumps(existing.to_dict(), indent=4))
-                self.helper.log('\nDifferences:')
-                self.helper.log(json.dumps(diff, indent=4))
-            # Differences exist between the existing obj and requested params
-            if not self.check_mode:
-                try:
-                    k8s_obj = self.helper.patch_object(name, namespace, k8s_obj)
-                except KubernetesException as exc:
-                    self.fail_json(msg="Failed to patch object: {}".format(exc.message))
-            return_attributes[self.kind] = k8s_obj.to_dict()
+                helper = self.get_resource_helper(api_version, kind)
+                helper.lookup_method('list', namespace)
+            except (KubernetesAnsibleResourceException, helper_exceptions.KubernetesException) as exc:
+                self.debug_log(self.helper, "Not deleting {} {} objects: {}".format(api_version, kind, exc))
+                self.warn("The installed client does not support {} {}, so teardown left those objects to the "
+                          "namespace controller".format(definition_api_version, definition_kind))
+                continue
+            try:
+                # Clients that do not page lists ignore the limit, and return all the names at once
+                listed = self._list(helper, namespace, {'return_fields': ['metadata.name'], 'limit': 500,
+                                                        'all_pages': True})
+            except KubernetesAnsibleResourceException as exc:
+                if exc.kwargs.get('error') == 404:
+                    # The cluster does not serve this kind
+                    continue
+                raise
+            requests.extend((helper, kind, item['metadata']['name']) for item in listed['items'])
+        self.debug_log(self.helper, "Deleting {} objects in {}".format(len(requests), namespace))
+        if not requests:
+            return
+        pool = ThreadPool(min(len(requests), self.workers))
+        try:
+            pool.map(lambda request: self._delete_background(namespace, *request), requests)
+        finally:
+            pool.close()
+
+    @timed('write')
+    def _delete_background(self, namespace, helper, kind, name):
+        """ Delete an object, leaving its dependents to the garbage collector. An object already gone is ignored. """
+        try:
+            delete_method = helper.lookup_method('delete', namespace)
+        except helper_exceptions.KubernetesException as exc:
+            raise KubernetesAnsibleResourceException(
+                "Failed to delete {} {}: {}".format(kind, name, exc.message), error=exc.value.get('status')
+            )
+        kwargs = {}
+        if accepts_argument(delete_method, 'body'):
+            # Older clients send no delete options for some kinds, which the API server then deletes in the foreground
+            kwargs['body'] = kubernetes_client.V1DeleteOptions(propagation_policy='Background')
+        try:
+            self._call_api(helper, 'delete', namespace, name, namespace, **kwargs)
+        except kubernetes_rest.ApiException as exc:
+            if exc.status != 404:
+                raise KubernetesAnsibleResourceException(
+                    "Failed to delete {} {}: {}".format(kind, name, exc.reason), error=exc.status
+                )
+
+    def _write_with_retry(self, helper, kind, existing, params, return_attributes):
+        """
+        Write the object with _write(). If it changed after it was read, the API server rejects the write with a 409
+        Conflict. The object is then read again, and the write recomputed from it, up to conflict_retries times,
+        with a randomized exponential backoff in between. The number of conflicts and retries is added to the
+        result, and to the error if the retries run out.
+        """
+        name = params.get('name')
+        namespace = params.get('namespace')
+        max_retries = params.get('conflict_retries', 5)
+        conflicts = 0
+        while True:
+            try:
+                return_attributes = self._write(helper, kind, existing, params, return_attributes)
+                break
+            except KubernetesAnsibleResourceException as exc:
+                if exc.kwargs.get('error') != 409:
+                    raise
+                conflicts += 1
+                if conflicts > max_retries:
+                    exc.kwargs.update(conflicts=conflicts, retries=conflicts - 1)
+                    raise
+            delay = min(CONFLICT_BACKOFF_MAX, CONFLICT_BACKOFF * 2 ** (conflicts - 1))
+            self.debug_log(helper, "Conflict writing {} {}, retrying in up to {:.2f}s".format(kind, name, delay))
+            time.sleep(random.uniform(0, delay))
+            existing = self._read(helper, name, namespace)
+        return_attributes['conflicts'] = conflicts
+        return_attributes['retries'] = conflicts
+        return return_attributes
+
+    def _write(self, helper, kind, existing, params, return_attributes):
+        """
+        Create, replace or patch the object, so that it matches the requested params. Updates carry the
+        resourceVersion of existing as a precondition.
+        """
+        name = params.get('name')
+        namespace = params.get('namespace')
+        force = params.get('force', False)
+
+        if not existing:
+            k8s_obj = self._create(helper, kind, params)
+            return_attributes[kind] = k8s_obj.to_dict()
             return_attributes['changed'] = True
-            self.exit_json(**return_attributes)
+            return return_attributes
 
-    def _create(self, namespace):
-        request_body = None
-        k8s_obj = None
+        if existing and force:
+            try:
+                request_body = helper.request_body_from_params(helper_params(helper, params))
+            except helper_exceptions.KubernetesException as exc:
+                raise KubernetesAnsibleResourceException("Failed to replace object: {}".format(exc.message))
+            # Only replace the version that was read
+            request_body.setdefault('metadata', {})['resourceVersion'] = existing.metadata.resource_version
+            k8s_obj = self._update(helper, 'replace', name, namespace, request_body)
+            return_attributes[kind] = k8s_obj.to_dict()
+            return_attributes['changed'] = True
+            return return_attributes
+
+        if params.get('diff_engine') == 'params':
+            changes = self._params_diff(helper, existing, params)
+            if changes is not None:
+                return self._patch_changes(helper, kind, existing, params, changes, return_attributes)
+
+        # Check if existing object should be patched. The copy keeps the resourceVersion that was read, and is sent as
+        # is by _update(), so the patch is rejected with a conflict if the object has changed since.
+        with timings.phase('diff'):
+            k8s_obj = copy.deepcopy(existing)
+            try:
+                helper.object_from_params(helper_params(helper, params), obj=k8s_obj)
+            except helper_exceptions.KubernetesException as exc:
+                raise KubernetesAnsibleResourceException("Failed to patch object: {}".format(exc.message))
+            match, diff = helper.objects_match(existing, k8s_obj)
+            diff = significant_changes(diff)
+        if match or not diff:
+            return_attributes[kind] = existing.to_dict()
+            return return_attributes
+        else:
+            self.debug_log(helper, 'Existing:')
+            self.debug_log(helper, lambda: json.dumps(existing.to_dict(), indent=4))
+            self.debug_log(helper, '\nDifferences:')
+            self.debug_log(helper, lambda: json.dumps(diff, indent=4))
+        # Differences exist between the existing obj and requested params. The status is not patched, so it is
+        # emptied, as patch_object() does.
+        if 'status' in helper.properties:
+            k8s_obj.status = helper.properties['status']['class']()
+        k8s_obj = self._update(helper, 'patch', name, namespace, k8s_obj)
+        return_attributes[kind] = k8s_obj.to_dict()
+        return_attributes['changed'] = True
+        return return_attributes
+
+    @staticmethod
+    def _call_api(helper, operation, namespace, *args, **kwargs):
+        """
+        Call the client's API method for an operation directly. Through the agent, the call is made by the helper it
+        keeps configured, on connections kept open between tasks. Which arguments the method accepts is checked on
+        helper.lookup_method(), which only inspects the client, so needs no agent.
+        """
+        if hasattr(helper, 'local_helper'):
+            return helper.call_api(operation, namespace, *args, **kwargs)
+        return call_api(helper, operation, namespace, *args, **kwargs)
+
+    @property
+    def workers(self):
+        """ The number of threads that may share a helper """
+        return max(1, self.params.get('workers') or 1)
+
+    @timed('get')
+    def _list(self, helper, namespace, params):
+        """
+        List the collection, one page of `limit` items at a time, following continue tokens unless all_pages is
+        false. Selectors are passed on to the API. Each page is reduced to the return fields of its items, if any,
+        before the next one is requested, so only one page of full objects is held in memory at a time.
+
+        Clients that do not support paging return the whole list at once. A limit is then ignored, unless only the
+        first page was requested, which fails, as does a continue token.
+
+        :return: dict: the list, with the metadata of the last page read
+        """
         try:
-            request_body = self.helper.request_body_from_params(self.params)
-        except KubernetesException as exc:
-            self.fail_json(msg="Failed to create object: {}".format(exc.message))
-        if not self.check_mode:
+            list_method = helper.lookup_method('list', namespace)
+        except helper_exceptions.KubernetesException as exc:
+            raise KubernetesAnsibleResourceException(
+                'Failed to retrieve requested object: {}'.format(exc.message),
+                error=exc.value.get('status')
+            )
+        args = (namespace,) if namespace else ()
+        all_pages = params.get('all_pages', True)
+        kwargs = {}
+        for param_name, arg_name in LIST_QUERY_PARAMS:
+            if not params.get(param_name):
+                continue
+            if not accepts_argument(list_method, arg_name):
+                if param_name == 'limit' and all_pages:
+                    self.debug_log(helper, "The client does not page lists, so limit is ignored")
+                    continue
+                raise KubernetesAnsibleResourceException(
+                    "The installed kubernetes client does not support the {} option. Upgrade the OpenShift and "
+                    "kubernetes clients, or remove the option.".format(param_name)
+                )
+            kwargs[arg_name] = params[param_name]
+        paged = accepts_argument(list_method, '_continue')
+        fields = self.return_fields(params)
+        items = []
+        while True:
             try:
-                k8s_obj = self.helper.create_object(namespace, body=request_body)
-            except KubernetesException as exc:
-                self.fail_json(msg="Failed to create object: {}".format(exc.message),
-                               error=exc.value.get('status'))
+                page = self._call_api(helper, 'list', namespace, *args, **kwargs)
+            except kubernetes_rest.ApiException as exc:
+                raise KubernetesAnsibleResourceException(
+                    'Failed to retrieve requested object: {}'.format(exc.reason),
+                    error=exc.status
+                )
+            except TypeError as exc:
+                # The client rejected an argument
+                raise KubernetesAnsibleResourceException('Failed to retrieve requested object: {}'.format(exc))
+            if params.get('return_mode') != 'none':
+                for item in page.items:
+                    items.append(project_fields(item.to_dict(), fields) if fields else item.to_dict())
+            token = getattr(page.metadata, '_continue', None)
+            if not token or not all_pages or not paged:
+                break
+            kwargs['_continue'] = token
+        self.debug_log(helper, "Listed {} items".format(len(items)))
+        return {
+            'api_version': page.api_version,
+            'kind': page.kind,
+            'metadata': page.metadata.to_dict(),
+            'items': items,
+        }
+
+    def _watch(self, helper, kind, name, namespace, resource_version, timeout):
+        """
+        Watch a single object, starting after resource_version, so no change since it was read is missed. Yields
+        (event type, object) until timeout seconds have passed.
+        """
+        # A watch is a stream, which can not be passed back from the agent, so it is always read by the local helper
+        api_helper = helper.local_helper() if hasattr(helper, 'local_helper') else helper
+        list_method = api_helper.lookup_method('list', namespace)
+        args = (namespace,) if namespace else ()
+        deadline = time.time() + timeout
+        watcher = kubernetes_watch.Watch()
+        # Decode events with the helper's client, which also knows the OpenShift models, as the helper itself does
+        watcher._api_client = api_helper.api_client
+        try:
+            for event in watcher.stream(list_method, *args,
+                                        field_selector='metadata.name={}'.format(name),
+                                        resource_version=resource_version,
+                                        timeout_seconds=timeout):
+                if event['type'] == 'ERROR':
+                    raise KubernetesAnsibleResourceException(
+                        "Failed to watch {} {}".format(kind, name), error=event.get('raw_object')
+                    )
+                yield event['type'], event['object']
+                if time.time() >= deadline:
+                    break
+        except kubernetes_rest.ApiException as exc:
+            raise KubernetesAnsibleResourceException(
+                "Failed to watch {} {}: {}".format(kind, name, exc.reason), error=exc.status
+            )
+        except KubernetesAnsibleResourceException:
+            raise
+        except Exception as exc:
+            # The stream broke off, or an event could not be decoded
+            raise KubernetesAnsibleResourceException("Failed to watch {} {}: {}".format(kind, name, exc))
+        finally:
+            watcher.stop()
+
+    @timed('wait')
+    def _wait_for_rollout(self, helper, kind, params):
+        """
+        Watch the object until its rollout is complete, rather than polling it with repeated module runs. A single
+        watch stream is opened, starting from the resourceVersion just read or written, so no update is missed.
+
+        :return: the object once its rollout is complete, or None if the object has no rollout to wait for
+        """
+        name = params.get('name')
+        namespace = params.get('namespace')
+        timeout = params.get('wait_timeout')
+        k8s_obj = self._read(helper, name, namespace)
+        complete = rollout_complete(k8s_obj)
+        if complete is None:
+            return None
+        if complete:
+            return k8s_obj
+
+        self.debug_log(helper, "Waiting up to {} seconds for {} {} rollout".format(timeout, kind, name))
+        for event_type, k8s_obj in self._watch(helper, kind, name, namespace, k8s_obj.metadata.resource_version,
+                                               timeout):
+            if event_type == 'DELETED':
+                raise KubernetesAnsibleResourceException(
+                    "{} {} was deleted while waiting for its rollout".format(kind, name)
+                )
+            if rollout_complete(k8s_obj):
+                return k8s_obj
+        raise KubernetesAnsibleResourceException(
+            "Timed out after {} seconds waiting for {} {} rollout".format(timeout, kind, name),
+            **{kind: k8s_obj.to_dict()}
+        )
+
+    @timed('wait')
+    def _wait_for_deletion(self, helper, kind, params):
+        """
+        Watch the object until it is gone. Objects with finalizers, such as a terminating namespace, remain until
+        the finalizers are done, so deleting them only starts their removal.
+        """
+        name = params.get('name')
+        namespace = params.get('namespace')
+        timeout = params.get('wait_timeout')
+        k8s_obj = self._read(helper, name, namespace)
+        if k8s_obj is None:
+            return
+        self.debug_log(helper, "Waiting up to {} seconds for {} {} to be removed".format(timeout, kind, name))
+        for event_type, _ in self._watch(helper, kind, name, namespace, k8s_obj.metadata.resource_version, timeout):
+            if event_type == 'DELETED':
+                return
+        raise KubernetesAnsibleResourceException(
+            "Timed out after {} seconds waiting for {} {} to be removed".format(timeout, kind, name)
+        )
+
+    @timed('diff')
+    def _params_diff(self, helper, existing, params):
+        """
+        Compare the requested params directly with the existing object, following each param's property_path,
+        without copying the object or building a new one.
+
+        :return: dict: the params whose values are not reflected in the object, or None if a param could not be
+                 mapped onto the object, in which case the caller should fall back to the object engine.
+        """
+        changes = {}
+        for param_name, value, spec in self._object_params(helper, params):
+            if not spec.get('property_path'):
+                return None
+            if not value_contained(value, property_value(existing, spec['property_path'])):
+                changes[param_name] = value
+        return changes
+
+    @staticmethod
+    def _object_params(helper, params):
+        """ Yield (name, value, spec) for each requested param that describes the object """
+        for param_name, value in params.items():
+            if value is None or param_name in CONTROL_PARAMS:
+                continue
+            spec = helper.argspec.get(param_name)
+            if spec is None or spec.get('auth_option'):
+                continue
+            yield param_name, value, spec
+
+    @timed('diff')
+    def _dry_run(self, helper, kind, existing, params, return_attributes):
+        """
+        Predict what state=present would change, for check mode. No request body or patched copy of the object is
+        built: the requested params are compared with the existing object in place, as the params diff engine does,
+        and the result carries a diff of only the params that would change.
+
+        :return: dict: the return attributes for the object, with the predicted changed flag and diff
+        """
+        requested = dict((param_name, value) for param_name, value, _ in self._object_params(helper, params))
+        if not existing:
+            return_attributes['changed'] = True
+            return_attributes['diff'] = dict(before={}, after=requested)
+            return return_attributes
+
+        return_attributes[kind] = existing.to_dict()
+        changes = self._params_diff(helper, existing, params)
+        if changes is None:
+            # A param could not be located in the object, so compare a patched copy, as the object engine does
+            k8s_obj = copy.deepcopy(existing)
+            try:
+                helper.object_from_params(helper_params(helper, params), obj=k8s_obj)
+            except helper_exceptions.KubernetesException as exc:
+                raise KubernetesAnsibleResourceException("Failed to patch object: {}".format(exc.message))
+            match, diff = helper.objects_match(existing, k8s_obj)
+            return_attributes['changed'] = params.get('force', False) or bool(not match and significant_changes(diff))
+            return return_attributes
+
+        # A forced update replaces the object, so it is reported as a change, as it is outside check mode
+        return_attributes['changed'] = params.get('force', False) or bool(changes)
+        before = {}
+        for param_name in changes:
+            before[param_name] = to_plain(property_value(existing, helper.argspec[param_name]['property_path']))
+        return_attributes['diff'] = dict(before=before, after=changes)
+        return return_attributes
+
+    @timed('write')
+    def _patch_changes(self, helper, kind, existing, params, changes, return_attributes):
+        """ Patch the object with only the changed params, as computed by _params_diff() """
+        name = params.get('name')
+        namespace = params.get('namespace')
+        if not changes:
+            return_attributes[kind] = existing.to_dict()
+            return return_attributes
+        self.debug_log(helper, '\nDifferences:')
+        self.debug_log(helper, lambda: json.dumps(changes, indent=4, default=str))
+        patch_params = dict(changes, name=name, namespace=namespace)
+        try:
+            k8s_obj = helper.object_from_params(helper_params(helper, patch_params))
+        except helper_exceptions.KubernetesException as exc:
+            raise KubernetesAnsibleResourceException("Failed to patch object: {}".format(exc.message))
+        # Only patch the version that was compared
+        k8s_obj.metadata.resource_version = existing.metadata.resource_version
+        k8s_obj = self._update(helper, 'patch', name, namespace, k8s_obj)
+        return_attributes[kind] = k8s_obj.to_dict()
+        return_attributes['changed'] = True
+        return return_attributes
+
+    @timed('write')
+    def _update(self, helper, operation, name, namespace, body):
+        """
+        Patch or replace the object through the client's API method. The body carries the resourceVersion of the
+        object that was read, as a precondition. The helper's patch_object() would clear it, and replace_object()
+        would read the object again and send the fresh one, so a conflicting write would never be detected.
+
+        :param operation: patch or replace
+        :param body: a model object or a request dict
+        :return: the updated object
+        """
+        args = (name, namespace) if namespace else (name,)
+        try:
+            k8s_obj = self._call_api(helper, operation, namespace, *args, body=body)
+        except helper_exceptions.KubernetesException as exc:
+            raise KubernetesAnsibleResourceException("Failed to {} object: {}".format(operation, exc.message))
+        except kubernetes_rest.ApiException as exc:
+            raise KubernetesAnsibleResourceException(
+                "Failed to {} object: {}".format(operation, api_error_message(exc)),
+                error=exc.status
+            )
+        return helper.fix_serialization(k8s_obj)
+
+    @timed('write')
+    def _create(self, helper, kind, params):
+        """ Create the object, returning it. In check mode nothing is sent, so no request body is built. """
+        if self.check_mode:
+            return None
+        try:
+            request_body = helper.request_body_from_params(helper_params(helper, params))
+        except helper_exceptions.KubernetesException as exc:
+            raise KubernetesAnsibleResourceException("Failed to create object: {}".format(exc.message))
+        try:
+            k8s_obj = helper.create_object(params.get('namespace'), body=request_body)
+        except helper_exceptions.KubernetesException as exc:
+            raise KubernetesAnsibleResourceException(
+                "Failed to create object: {}".format(exc.message),
+                error=exc.value.get('status')
+            )
         return k8s_obj
 
-    def _read(self, name, namespace):
+    @timed('get')
+    def _read(self, helper, name, namespace):
         k8s_obj = None
         try:
-            k8s_obj = self.helper.get_object(name, namespace)
-        except KubernetesException as exc:
-            self.fail_json(msg='Failed to retrieve requested object',
-                           error=exc.value.get('status'))
+            k8s_obj = helper.get_object(name, namespace)
+        except helper_exceptions.KubernetesException as exc:
+            raise KubernetesAnsibleResourceException(
+                'Failed to retrieve requested object',
+                error=exc.value.get('status')
+            )
         return k8s_obj
 
-    def load_resource_definition(self, src):
-        """ Load the requested src path """
-        result = None
+    def iter_resource_definitions(self, src):
+        """ Yield the definitions in the requested src path, reading one YAML document at a time """
         path = os.path.normpath(src)
-        self.helper.log("Reading definition from {}".format(path))
+        self.debug_log(self.helper, "Reading definition from {}".format(path))
         if not os.path.exists(path):
             self.fail_json(msg="Error accessing {}. Does the file exist?".format(path))
         try:
-            result = yaml.safe_load(open(path, 'r'))
+            for document in iter_yaml_documents(path):
+                yield document
         except (IOError, yaml.YAMLError) as exc:
-            self.fail_json(msg="Error loading resource_definition: {}".format(exc))
-        return result
+            raise KubernetesAnsibleResourceException("Error loading resource_definition: {}".format(exc))
 
-    def resource_to_parameters(self, resource):
+    def resource_to_parameters(self, resource, helper=None):
         """ Converts a resource definition to module parameters """
+        helper = helper or self.helper
         parameters = {}
         for key, value in resource.items():
             if key in ('apiVersion', 'kind', 'status'):
@@ -270,28 +1476,73 @@ class KubernetesAnsibleModule(AnsibleModule):
                 for meta_key, meta_value in value.items():
                     if meta_key in ('name', 'namespace', 'labels', 'annotations'):
                         parameters[meta_key] = meta_value
-            elif key in self.helper.argspec and value is not None:
+            elif key in helper.argspec and value is not None:
                 parameters[key] = value
             elif isinstance(value, dict):
-                self._add_parameter(value, [key], parameters)
-        self.helper.log("Request to parameters: {}".format(json.dumps(parameters)))
+                self._add_parameter(helper, value, [key], parameters)
+        self.debug_log(helper, lambda: "Request to parameters: {}".format(json.dumps(parameters)))
         return parameters
 
-    def _add_parameter(self, request, path, parameters):
-        for key, value in request.items():
-            if path:
-                param_name = '_'.join(path + [self.helper.attribute_to_snake(key)])
-            else:
-                param_name = self.helper.attribute_to_snake(key)
-            if param_name in self.helper.argspec and value is not None:
-                parameters[param_name] = value
-            elif isinstance(value, dict):
-                continue_path = copy.copy(path) if path else []
-                continue_path.append(self.helper.attribute_to_snake(key))
-                self._add_parameter(value, continue_path, parameters)
-            else:
-                self.fail_json(
-                    msg=("Error parsing resource definition. Encountered {}, which does not map to a module "
-                         "parameter. If this looks like a problem with the module, please open an issue at "
-                         "github.com/openshift/openshift-restclient-python/issues").format(param_name)
+    def _add_parameter(self, helper, request, path, parameters):
+        """
+        Flatten a nested dict of a resource definition into module parameters, joining the snake_case keys along
+        the way with '_'. The dict is walked iteratively, and a branch is only descended into while its name is
+        the prefix of some parameter.
+        """
+        prefixes = self.param_prefixes(helper)
+        stack = [('_'.join(path), iter(request.items()))]
+        while stack:
+            prefix, items = stack[-1]
+            for key, value in items:
+                param_name = prefix + '_' + self.to_snake(helper, key) if prefix else self.to_snake(helper, key)
+                if param_name in helper.argspec and value is not None:
+                    parameters[param_name] = value
+                    continue
+                if isinstance(value, dict):
+                    if param_name in prefixes:
+                        stack.append((param_name, iter(value.items())))
+                        break
+                    param_name = self._first_leaf_name(helper, param_name, value)
+                    if param_name is None:
+                        # Only empty dicts below, which set nothing
+                        continue
+                raise KubernetesAnsibleResourceException(
+                    ("Error parsing resource definition. Encountered {}, which does not map to a module "
+                     "parameter. If this looks like a problem with the module, please open an issue at "
+                     "github.com/openshift/openshift-restclient-python/issues").format(param_name)
                 )
+            else:
+                stack.pop()
+
+    def _first_leaf_name(self, helper, prefix, request):
+        """ Return the flattened name of the first value below request that is not a dict, or None """
+        stack = [(prefix, request)]
+        while stack:
+            prefix, request = stack.pop()
+            for key, value in request.items():
+                param_name = prefix + '_' + self.to_snake(helper, key)
+                if not isinstance(value, dict):
+                    return param_name
+                stack.append((param_name, value))
+        return None
+
+    def to_snake(self, helper, name):
+        """ helper.attribute_to_snake(), memoized, as the same keys recur throughout a definition """
+        if name not in self.snake_cache:
+            self.snake_cache[name] = helper.attribute_to_snake(name)
+        return self.snake_cache[name]
+
+    def param_prefixes(self, helper):
+        """
+        The set of every '_' delimited prefix of the helper's parameter names. For example,
+        spec_template_spec_containers contributes spec, spec_template and spec_template_spec. Built once per helper.
+        """
+        if helper not in self.param_prefix_cache:
+            prefixes = set()
+            for param_name in helper.argspec:
+                index = param_name.find('_')
+                while index > 0:
+                    prefixes.add(param_name[:index])
+                    index = param_name.find('_', index + 1)
+            self.param_prefix_cache[helper] = prefixes
+        return self.param_prefix_cache[helper]
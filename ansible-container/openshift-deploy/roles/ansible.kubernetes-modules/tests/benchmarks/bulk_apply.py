@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+Compare applying N independent services one task at a time with applying them in a single bulk request,
+against the fake API with injected latency. With a bulk request, wall time grows with the number of
+dependency stages (the namespace, then everything in it), rather than with the number of objects.
+
+    python tests/benchmarks/bulk_apply.py --objects 40 --latency 0.05 --workers 8
+"""
+
+import argparse
+import time
+
+from fake_api import FakeApiServer
+from runner import add_module_utils_path, run_module, write_kubeconfig
+
+
+def service(name):
+    return {
+        'apiVersion': 'v1',
+        'kind': 'Service',
+        'metadata': {'name': name, 'namespace': 'bench'},
+        'spec': {'selector': {'app': name}, 'ports': [{'name': 'web', 'port': 80, 'targetPort': 8000}]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--objects', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    add_module_utils_path()
+    from ansible.module_utils.k8s_common import KubernetesAnsibleModule
+
+    namespace = {'apiVersion': 'v1', 'kind': 'Namespace', 'metadata': {'name': 'bench'}}
+    services = [service('svc-{}'.format(i)) for i in range(args.objects)]
+
+    for mode in ('per-task', 'bulk'):
+        with FakeApiServer(latency=args.latency) as api:
+            auth = dict(kubeconfig=write_kubeconfig(api.url), host=api.url)
+            start = time.time()
+            if mode == 'per-task':
+                for definition in [namespace] + services:
+                    kind = 'namespace' if definition['kind'] == 'Namespace' else 'service'
+                    result = run_module(KubernetesAnsibleModule, kind, 'V1',
+                                        dict(auth, state='present', resource_definition=definition))
+                    assert not result.get('failed'), result.get('msg')
+            else:
+                result = run_module(KubernetesAnsibleModule, 'service', 'V1',
+                                    dict(auth, state='present', workers=args.workers,
+                                         resource_definitions=[namespace] + services))
+                assert not result.get('failed'), result.get('msg')
+            elapsed = time.time() - start
+            print('{:<10} objects={:<5} latency={:.3f}s  wall={:.3f}s  requests={}'.format(
+                mode, args.objects + 1, args.latency, elapsed, api.state.requests))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,440 @@
+"""
+A small in-process stand-in for the Kubernetes and OpenShift REST API, used by the benchmarks in this folder.
+
+Objects are kept in memory, keyed by API path, and every request can be delayed by a fixed latency to
+approximate a remote cluster. Only the verbs the modules use are implemented: GET, POST, PUT, PATCH and DELETE.
+Collections can be filtered with labelSelector and fieldSelector, paged with limit and continue, and watched with
+?watch=true, which streams an event for every change. Given a rollout_delay, the server plays the part of the
+deployment controller, and marks deployments and deployment configs as rolled out that many seconds after each
+change to their spec. Given a termination_delay, deleting a namespace leaves it Terminating while the objects in it
+are removed one at a time, and for that many seconds more.
+"""
+
+import copy
+import errno
+import json
+import sys
+import threading
+import time
+import traceback
+import uuid
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+
+def parse_path(path):
+    """
+    Split an API path into (prefix, namespace, plural, name). For example,
+    /apis/extensions/v1beta1/namespaces/hello/deployments/web becomes
+    ('/apis/extensions/v1beta1', 'hello', 'deployments', 'web'). The core group lives under /api/v1, and the
+    OpenShift group under /oapi/v1.
+    """
+    parts = [part for part in path.split('/') if part]
+    if parts[:1] in (['api'], ['oapi']):
+        prefix, parts = parts[:2], parts[2:]
+    else:
+        prefix, parts = parts[:3], parts[3:]
+    namespace = None
+    if len(parts) >= 3 and parts[0] == 'namespaces':
+        namespace, parts = parts[1], parts[2:]
+    plural = parts[0] if parts else None
+    name = parts[1] if len(parts) > 1 else None
+    return '/' + '/'.join(prefix), namespace, plural, name
+
+
+def merge(target, patch):
+    """ Apply a JSON merge patch to target in place """
+    for key, value in patch.items():
+        if value is None:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+    return target
+
+
+def selector_matches(obj, label_selector, field_selector):
+    """
+    Check obj against a label selector and a field selector. Only the equality based forms are supported:
+    key=value, key!=value and, for labels, a bare key to require the label.
+    """
+    labels = obj.get('metadata', {}).get('labels') or {}
+    for requirement in filter(None, (label_selector or '').split(',')):
+        if '!=' in requirement:
+            key, value = requirement.split('!=', 1)
+            if labels.get(key) == value:
+                return False
+        elif '=' in requirement:
+            key, value = requirement.split('=', 1)
+            if labels.get(key.rstrip('=')) != value.lstrip('='):
+                return False
+        elif requirement not in labels:
+            return False
+    for requirement in filter(None, (field_selector or '').split(',')):
+        negate = '!=' in requirement
+        path, value = requirement.split('!=' if negate else '=', 1)
+        current = obj
+        for key in path.rstrip('=').split('.'):
+            current = current.get(key) if isinstance(current, dict) else None
+        if (str(current) == value.lstrip('=')) == negate:
+            return False
+    return True
+
+
+# Collections whose objects are rolled out by the fake controller
+ROLLOUT_PLURALS = ('deployments', 'deploymentconfigs')
+
+# The status new objects of these collections are given by the API server, or right away by their controller. The
+# client helper waits for it after a create.
+PROGRESSING = {'type': 'Progressing', 'status': 'True', 'reason': 'NewReplicaSetCreated'}
+INITIAL_STATUS = {
+    'namespaces': {'phase': 'Active'},
+    'projects': {'phase': 'Active'},
+    'services': {'loadBalancer': {}},
+    'deployments': {'conditions': [PROGRESSING]},
+    'deploymentconfigs': {'conditions': [PROGRESSING]},
+    # Admitted by the default router
+    'routes': {'ingress': [{'routerName': 'router', 'conditions': [{'type': 'Admitted', 'status': 'True'}]}]},
+}
+
+
+class FakeApiState(object):
+    def __init__(self, latency=0.0, rollout_delay=None, termination_delay=None):
+        self.latency = latency
+        self.rollout_delay = rollout_delay
+        self.termination_delay = termination_delay
+        self.objects = {}
+        self.requests = {}
+        self.events = []
+        self.resource_version = 0
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def count(self, method):
+        with self.lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+
+    def next_resource_version(self):
+        self.resource_version += 1
+        return str(self.resource_version)
+
+    def record(self, event_type, key, obj):
+        """ Record a watch event for the object at key, and wake any watchers. Call with the lock held. """
+        self.events.append((int(obj['metadata']['resourceVersion']), key, event_type, copy.deepcopy(obj)))
+        self.changed.notify_all()
+        if self.rollout_delay is not None and event_type != 'DELETED' and key[2] in ROLLOUT_PLURALS:
+            generation = obj['metadata'].get('generation')
+            if (obj.get('status') or {}).get('observedGeneration') != generation:
+                timer = threading.Timer(self.rollout_delay, self.roll_out, (key, generation))
+                timer.daemon = True
+                timer.start()
+
+    def roll_out(self, key, generation):
+        """ Mark the object at key as rolled out, if its spec has not changed again since """
+        with self.lock:
+            obj = self.objects.get(key)
+            if obj is None or obj['metadata'].get('generation') != generation:
+                return
+            replicas = obj.get('spec', {}).get('replicas', 1)
+            obj['status'] = {'observedGeneration': generation, 'replicas': replicas, 'updatedReplicas': replicas,
+                             'readyReplicas': replicas, 'availableReplicas': replicas}
+            obj['metadata']['resourceVersion'] = self.next_resource_version()
+            self.record('MODIFIED', key, obj)
+
+    def remove(self, key, obj):
+        """ Record the removal of an object, already popped from objects. Call with the lock held. """
+        obj['metadata']['resourceVersion'] = self.next_resource_version()
+        self.record('DELETED', key, obj)
+
+    def terminate(self, key):
+        """
+        Play the namespace controller for a deleted namespace: remove the objects left in it one at a time, each
+        taking the request latency, then wait termination_delay and remove the namespace itself.
+        """
+        while True:
+            with self.lock:
+                children = [child for child in self.objects if child[1] == key[3]]
+                if children:
+                    self.remove(children[0], self.objects.pop(children[0]))
+            if not children:
+                break
+            time.sleep(self.latency)
+        time.sleep(self.termination_delay)
+        with self.lock:
+            obj = self.objects.pop(key, None)
+            if obj is not None:
+                self.remove(key, obj)
+
+    def reset_counts(self):
+        with self.lock:
+            self.requests = {}
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _status(self, code, reason, message):
+        self._send(code, {'kind': 'Status', 'apiVersion': 'v1', 'status': 'Failure', 'reason': reason,
+                          'message': message, 'code': code})
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length).decode('utf-8')) if length else {}
+
+    def _handle(self, method):
+        self.state.count(method)
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        url = urlparse(self.path)
+        self.query = dict((key, values[-1]) for key, values in parse_qs(url.query).items())
+        prefix, namespace, plural, name = parse_path(url.path)
+        if plural is None:
+            return self._status(404, 'NotFound', 'unknown path {}'.format(url.path))
+        try:
+            getattr(self, 'handle_' + method.lower())(prefix, namespace, plural, name)
+        except Exception as exc:
+            self._status(500, 'InternalError', str(exc))
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _collection(self, prefix, namespace, plural):
+        with self.state.lock:
+            return [obj for key, obj in sorted(self.state.objects.items(),
+                                                    key=lambda item: [part or '' for part in item[0]])
+                    if key[0] == prefix and key[2] == plural and (namespace is None or key[1] == namespace)]
+
+    def _watch(self, prefix, namespace, plural):
+        """ Stream watch events for the collection as chunked JSON lines, until timeoutSeconds expire """
+        selected_name = None
+        field_selector = self.query.get('fieldSelector', '')
+        if field_selector.startswith('metadata.name='):
+            selected_name = field_selector.split('=', 1)[1]
+
+        def selected(key):
+            return (key[0] == prefix and key[2] == plural and (namespace is None or key[1] == namespace) and
+                    (selected_name is None or key[3] == selected_name))
+
+        deadline = time.time() + float(self.query.get('timeoutSeconds') or 60)
+        with self.state.lock:
+            if self.query.get('resourceVersion'):
+                since = int(self.query['resourceVersion'])
+                pending = []
+            else:
+                since = self.state.resource_version
+                pending = [('ADDED', copy.deepcopy(obj)) for key, obj in self.state.objects.items() if selected(key)]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            while True:
+                for event_type, obj in pending:
+                    line = (json.dumps({'type': event_type, 'object': obj}) + '\n').encode('utf-8')
+                    self.wfile.write('{:x}\r\n'.format(len(line)).encode('ascii') + line + b'\r\n')
+                    self.wfile.flush()
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                with self.state.lock:
+                    if self.state.resource_version <= since:
+                        self.state.changed.wait(remaining)
+                    pending = [(event_type, obj) for version, key, event_type, obj in self.state.events
+                               if version > since and selected(key)]
+                    since = self.state.resource_version
+            self.wfile.write(b'0\r\n\r\n')
+        except (IOError, OSError):
+            # The client stopped watching
+            self.close_connection = True
+
+    def handle_get(self, prefix, namespace, plural, name):
+        if name is None and self.query.get('watch', '').lower() in ('true', '1'):
+            return self._watch(prefix, namespace, plural)
+        if name is None:
+            items = [obj for obj in self._collection(prefix, namespace, plural)
+                     if selector_matches(obj, self.query.get('labelSelector'), self.query.get('fieldSelector'))]
+            kind = items[0]['kind'] + 'List' if items else 'List'
+            metadata = {'resourceVersion': str(self.state.resource_version)}
+            # Continue tokens are simply the offset of the next page
+            offset = int(self.query.get('continue') or 0)
+            limit = int(self.query.get('limit') or 0)
+            if limit and offset + limit < len(items):
+                metadata['continue'] = str(offset + limit)
+            items = items[offset:offset + limit] if limit else items[offset:]
+            return self._send(200, {'kind': kind, 'apiVersion': prefix.split('/', 2)[-1], 'items': items,
+                                    'metadata': metadata})
+        obj = self.state.objects.get((prefix, namespace, plural, name))
+        if obj is None:
+            return self._status(404, 'NotFound', '{} "{}" not found'.format(plural, name))
+        self._send(200, obj)
+
+    def handle_post(self, prefix, namespace, plural, name):
+        obj = self._body()
+        metadata = obj.setdefault('metadata', {})
+        key = (prefix, namespace, plural, metadata.get('name'))
+        with self.state.lock:
+            if key in self.state.objects:
+                return self._status(409, 'AlreadyExists', '{} "{}" already exists'.format(plural, key[3]))
+            if namespace:
+                metadata['namespace'] = namespace
+            metadata['uid'] = str(uuid.uuid4())
+            metadata['resourceVersion'] = self.state.next_resource_version()
+            metadata['creationTimestamp'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            metadata['generation'] = 1
+            if plural in INITIAL_STATUS:
+                obj.setdefault('status', copy.deepcopy(INITIAL_STATUS[plural]))
+            self.state.objects[key] = obj
+            self.state.record('ADDED', key, obj)
+        self._send(201, obj)
+
+    @staticmethod
+    def _conflicts(existing, body):
+        """ Check the resourceVersion precondition of an update, if the body has one """
+        version = (body.get('metadata') or {}).get('resourceVersion')
+        return version is not None and version != existing['metadata']['resourceVersion']
+
+    def _conflict(self, plural, name):
+        """ Answer an update whose precondition failed. Called with the lock held, so it is counted directly. """
+        self.state.requests['CONFLICT'] = self.state.requests.get('CONFLICT', 0) + 1
+        message = 'Operation cannot be fulfilled on {} "{}": the object has been modified'.format(plural, name)
+        self._status(409, 'Conflict', message)
+
+    def handle_put(self, prefix, namespace, plural, name):
+        obj = self._body()
+        key = (prefix, namespace, plural, name)
+        with self.state.lock:
+            existing = self.state.objects.get(key)
+            if existing is None:
+                return self._status(404, 'NotFound', '{} "{}" not found'.format(plural, name))
+            if self._conflicts(existing, obj):
+                return self._conflict(plural, name)
+            metadata = obj.setdefault('metadata', {})
+            for field in ('uid', 'creationTimestamp', 'namespace', 'generation'):
+                if field in existing['metadata']:
+                    metadata[field] = existing['metadata'][field]
+            if obj.get('spec') != existing.get('spec'):
+                metadata['generation'] = metadata.get('generation', 0) + 1
+            metadata['resourceVersion'] = self.state.next_resource_version()
+            self.state.objects[key] = obj
+            self.state.record('MODIFIED', key, obj)
+        self._send(200, obj)
+
+    def handle_patch(self, prefix, namespace, plural, name):
+        patch = self._body()
+        key = (prefix, namespace, plural, name)
+        with self.state.lock:
+            existing = self.state.objects.get(key)
+            if existing is None:
+                return self._status(404, 'NotFound', '{} "{}" not found'.format(plural, name))
+            if self._conflicts(existing, patch):
+                return self._conflict(plural, name)
+            obj = merge(copy.deepcopy(existing), patch)
+            if obj.get('spec') != existing.get('spec'):
+                obj['metadata']['generation'] = obj['metadata'].get('generation', 0) + 1
+            obj['metadata']['resourceVersion'] = self.state.next_resource_version()
+            self.state.objects[key] = obj
+            self.state.record('MODIFIED', key, obj)
+        self._send(200, obj)
+
+    def handle_delete(self, prefix, namespace, plural, name):
+        # Delete options are accepted, but ignored
+        self._body()
+        key = (prefix, namespace, plural, name)
+        with self.state.lock:
+            if plural == 'namespaces' and self.state.termination_delay is not None:
+                obj = self.state.objects.get(key)
+                if obj is not None and 'deletionTimestamp' not in obj['metadata']:
+                    obj['metadata']['deletionTimestamp'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                    obj['status'] = {'phase': 'Terminating'}
+                    obj['metadata']['resourceVersion'] = self.state.next_resource_version()
+                    self.state.record('MODIFIED', key, obj)
+                    thread = threading.Thread(target=self.state.terminate, args=(key,))
+                    thread.daemon = True
+                    thread.start()
+            else:
+                obj = self.state.objects.pop(key, None)
+                if obj is not None:
+                    self.state.remove(key, obj)
+                    if plural == 'namespaces':
+                        for child in [child for child in self.state.objects if child[1] == name]:
+                            self.state.remove(child, self.state.objects.pop(child))
+        if obj is None:
+            return self._status(404, 'NotFound', '{} "{}" not found'.format(plural, name))
+        self._send(200, {'kind': 'Status', 'apiVersion': 'v1', 'status': 'Success'})
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        """
+        Report errors on stderr, as Python 3 does. Python 2 prints them to stdout, where module results are read.
+        Clients closing a watch early are not errors.
+        """
+        exc = sys.exc_info()[1]
+        if isinstance(exc, (IOError, OSError)) and exc.errno in (errno.EPIPE, errno.ECONNRESET):
+            return
+        sys.stderr.write('Exception handling a request from {}:\n{}'.format(client_address, traceback.format_exc()))
+
+
+class FakeApiServer(object):
+    """
+    Serve the fake API on a random local port, in a background thread.
+
+        with FakeApiServer(latency=0.05) as api:
+            run_module(..., host=api.url)
+    """
+
+    def __init__(self, latency=0.0, handler=FakeApiHandler, rollout_delay=None, termination_delay=None):
+        self.state = FakeApiState(latency, rollout_delay, termination_delay)
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.state = self.state
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.httpd.server_address[1])
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
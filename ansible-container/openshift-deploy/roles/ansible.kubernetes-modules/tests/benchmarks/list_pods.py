@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Compare listing a large namespace in one request, returning whole pods, with listing it in pages and returning only
+a few fields of each pod. Reports wall time, peak memory allocated while the module runs (Python 3 only), the size
+of the result, and the requests made. Clients that do not page lists return the whole list at once, so the paged
+case is left out with them.
+
+    python tests/benchmarks/list_pods.py --pods 10000 --limit 500
+"""
+
+import argparse
+import json
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from fake_api import FakeApiServer
+from runner import add_module_utils_path, run_module, write_kubeconfig
+
+
+def pod(index):
+    name = 'web-{}'.format(index)
+    return {
+        'apiVersion': 'v1',
+        'kind': 'Pod',
+        'metadata': {'name': name, 'namespace': 'bench', 'uid': 'uid-{}'.format(index),
+                     'resourceVersion': str(index), 'labels': {'app': 'web', 'shard': str(index % 4)},
+                     'annotations': {'kubernetes.io/created-by': 'x' * 400}},
+        'spec': {'nodeName': 'node-{}'.format(index % 20),
+                 'containers': [{'name': 'web', 'image': 'nginx:1.13',
+                                 'env': [{'name': 'VAR_{}'.format(i), 'value': str(i)} for i in range(10)],
+                                 'ports': [{'containerPort': 80, 'protocol': 'TCP'}]}]},
+        'status': {'phase': 'Running', 'podIP': '10.0.{}.{}'.format(index // 250, index % 250),
+                   'conditions': [{'type': 'Ready', 'status': 'True'}]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pods', type=int, default=10000)
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    add_module_utils_path()
+    from ansible.module_utils.k8s_common import KubernetesAnsibleModule, accepts_argument
+    from kubernetes.client import CoreV1Api
+
+    paging = accepts_argument(CoreV1Api.list_namespaced_pod, '_continue')
+    if not paging:
+        print('The installed client does not page lists, so each list is read in a single request')
+    modes = [('full', {})]
+    if paging:
+        modes.append(('paged', {'limit': args.limit}))
+    modes.extend([
+        ('paged+fields' if paging else 'fields',
+         {'limit': args.limit, 'return_fields': ['metadata.name', 'status.phase', 'status.podIP']}),
+        ('selector', {'limit': args.limit, 'label_selector': 'shard=0', 'return_fields': ['metadata.name']}),
+    ])
+    with FakeApiServer(latency=args.latency) as api:
+        with api.state.lock:
+            for index in range(args.pods):
+                api.state.objects[('/api/v1', 'bench', 'pods', 'web-{}'.format(index))] = pod(index)
+        auth = dict(kubeconfig=write_kubeconfig(api.url), host=api.url, namespace='bench')
+        for mode, options in modes:
+            api.state.reset_counts()
+            if tracemalloc:
+                tracemalloc.start()
+            start = time.time()
+            result = run_module(KubernetesAnsibleModule, 'pod_list', 'V1', dict(auth, **options))
+            elapsed = time.time() - start
+            peak = tracemalloc.get_traced_memory()[1] if tracemalloc else 0
+            if tracemalloc:
+                tracemalloc.stop()
+            assert not result.get('failed'), result.get('msg')
+            print('{:<13} items={:<6} wall={:.3f}s  peak={:.1f}MB  result={:.1f}MB  requests={}'.format(
+                mode, len(result['pod_list']['items']), elapsed, peak / 1e6, len(json.dumps(result)) / 1e6,
+                api.state.requests))
+
+
+if __name__ == '__main__':
+    main()
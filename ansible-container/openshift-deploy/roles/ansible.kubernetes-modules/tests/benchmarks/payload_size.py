@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Measure the bytes shipped to the target for every module in library/, and an estimate of the time needed to
+transfer them. "inline" is the module as it is shipped, with its DOCUMENTATION, EXAMPLES and RETURN strings.
+"slim" is the size it would have without them. Ansible 2.3 only reads the documentation from the module file, so
+the strings stay in it; this measures what they cost.
+
+Ansible zips the module into its payload, so both raw and deflated sizes are reported.
+
+    python tests/benchmarks/payload_size.py --bandwidth 100 --latency 0.001
+"""
+
+import argparse
+import glob
+import os
+import re
+import zlib
+
+from runner import LIBRARY_PATH
+
+DOC_STRINGS = re.compile(b"^(DOCUMENTATION|EXAMPLES|RETURN) = '''.*?'''\n\n?", re.MULTILINE | re.DOTALL)
+
+
+def deflated(data):
+    return len(zlib.compress(data, 6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bandwidth', type=float, default=100.0, help='link speed in Mbit/s')
+    parser.add_argument('--latency', type=float, default=0.001, help='round trip time in seconds, per module')
+    parser.add_argument('--top', type=int, default=5, help='list the largest modules')
+    args = parser.parse_args()
+
+    rows = []
+    for path in sorted(glob.glob(os.path.join(LIBRARY_PATH, '*.py'))):
+        with open(path, 'rb') as f:
+            module = f.read()
+        slim = DOC_STRINGS.sub(b'', module)
+        rows.append((os.path.basename(path), len(module), deflated(module), len(slim), deflated(slim)))
+
+    def transfer_time(total_bytes):
+        return total_bytes * 8 / (args.bandwidth * 1000000) + args.latency * len(rows)
+
+    totals = [sum(row[i] for row in rows) for i in range(1, 5)]
+    print('{} modules'.format(len(rows)))
+    print('{:<8} raw={:>10}  deflated={:>9}  transfer={:.3f}s'.format('inline', totals[0], totals[1],
+                                                                       transfer_time(totals[1])))
+    print('{:<8} raw={:>10}  deflated={:>9}  transfer={:.3f}s'.format('slim', totals[2], totals[3],
+                                                                       transfer_time(totals[3])))
+    print('\nLargest modules, deflated inline -> slim bytes:')
+    for row in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print('  {:<60} {:>7} -> {:>5}'.format(row[0], row[2], row[4]))
+
+
+if __name__ == '__main__':
+    main()
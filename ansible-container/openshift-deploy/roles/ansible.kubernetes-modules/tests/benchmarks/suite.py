@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Benchmark the module layer against the fake API, without a cluster. For each kind, execute_module() is driven
+through create, no-op, patch, replace, list and delete, and each phase reports its mean wall time, the peak memory
+allocated while it ran (Python 3 only; the fake API runs in the same process, so its allocations are included) and
+the requests it made.
+
+Results can be written as JSON with --output, and compared with an earlier run with --baseline. Any phase that got
+slower than the baseline by more than --threshold makes the script exit non-zero, so it can guard CI against
+regressions.
+
+    python tests/benchmarks/suite.py --runs 5 --output results.json
+    python tests/benchmarks/suite.py --runs 5 --baseline results.json --threshold 1.25
+"""
+
+import argparse
+import copy
+import json
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from fake_api import FakeApiServer
+from runner import add_module_utils_path, deployment_api_version, run_module, write_kubeconfig
+
+PHASES = ('create', 'noop', 'patch', 'replace', 'list', 'delete')
+
+
+def config_map(name):
+    return {'apiVersion': 'v1', 'kind': 'ConfigMap', 'metadata': {'name': name, 'namespace': 'bench'},
+            'data': {'key': 'value'}}
+
+
+def secret(name):
+    return {'apiVersion': 'v1', 'kind': 'Secret', 'metadata': {'name': name, 'namespace': 'bench'},
+            'type': 'Opaque', 'data': {'password': 'c2VjcmV0'}}
+
+
+def service(name):
+    return {'apiVersion': 'v1', 'kind': 'Service', 'metadata': {'name': name, 'namespace': 'bench'},
+            'spec': {'selector': {'app': name}, 'ports': [{'name': 'web', 'port': 80, 'targetPort': 8000}]}}
+
+
+def pod_template(name):
+    return {
+        'metadata': {'labels': {'app': name}},
+        'spec': {'containers': [{'name': 'web', 'image': 'nginx:1.13', 'ports': [{'containerPort': 8000}]}]},
+    }
+
+
+def deployment(name):
+    return {'apiVersion': 'extensions/v1beta1', 'kind': 'Deployment',
+            'metadata': {'name': name, 'namespace': 'bench'},
+            'spec': {'replicas': 1, 'template': pod_template(name)}}
+
+
+def route(name):
+    return {'apiVersion': 'v1', 'kind': 'Route', 'metadata': {'name': name, 'namespace': 'bench'},
+            'spec': {'to': {'kind': 'Service', 'name': name}, 'port': {'targetPort': 'web'}}}
+
+
+def deployment_config(name):
+    return {'apiVersion': 'v1', 'kind': 'DeploymentConfig', 'metadata': {'name': name, 'namespace': 'bench'},
+            'spec': {'replicas': 1, 'selector': {'app': name}, 'template': pod_template(name),
+                     'triggers': [{'type': 'ConfigChange'}]}}
+
+
+def changed(definition, value):
+    """ Return a copy of definition with a changed label, for the patch and replace phases """
+    definition = copy.deepcopy(definition)
+    definition['metadata'].setdefault('labels', {})['revision'] = value
+    return definition
+
+
+# (module class name, api_version, kind, definition builder). An api_version of None is looked up when the suite runs.
+KINDS = (
+    ('KubernetesAnsibleModule', 'V1', 'config_map', config_map),
+    ('KubernetesAnsibleModule', 'V1', 'secret', secret),
+    ('KubernetesAnsibleModule', 'V1', 'service', service),
+    ('KubernetesAnsibleModule', None, 'deployment', deployment),
+    ('OpenShiftAnsibleModule', 'V1', 'route', route),
+    ('OpenShiftAnsibleModule', 'V1', 'deployment_config', deployment_config),
+)
+
+
+def measure(api, module_class, kind, api_version, args):
+    """ Run one module execution, returning (seconds, peak bytes, requests by method) """
+    api.state.reset_counts()
+    if tracemalloc:
+        tracemalloc.start()
+    start = time.time()
+    result = run_module(module_class, kind, api_version, args)
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1] if tracemalloc else 0
+    if tracemalloc:
+        tracemalloc.stop()
+    if result.get('failed'):
+        raise RuntimeError('{} {}: {}'.format(kind, args.get('state', 'list'), result.get('msg')))
+    return elapsed, peak, dict(api.state.requests)
+
+
+def run_kind(api, auth, module_class, api_version, kind, build, runs):
+    """ Drive one kind through every phase, runs times, and return the mean of each phase """
+    samples = dict((phase, []) for phase in PHASES)
+    for run in range(runs):
+        name = 'bench-{}'.format(run)
+        definition = build(name)
+        phases = (
+            ('create', kind, dict(auth, state='present', resource_definition=definition)),
+            ('noop', kind, dict(auth, state='present', resource_definition=definition)),
+            ('patch', kind, dict(auth, state='present', resource_definition=changed(definition, 'patch'))),
+            ('replace', kind, dict(auth, state='present', force=True,
+                                   resource_definition=changed(definition, 'replace'))),
+            ('list', kind + '_list', dict(auth, namespace='bench')),
+            ('delete', kind, dict(auth, state='absent', name=name, namespace='bench')),
+        )
+        for phase, module_kind, args in phases:
+            samples[phase].append(measure(api, module_class, module_kind, api_version, args))
+
+    report = {}
+    for phase, values in samples.items():
+        report[phase] = {
+            'ms': sum(value[0] for value in values) / len(values) * 1e3,
+            'peak_kb': max(value[1] for value in values) / 1e3,
+            'requests': values[-1][2],
+        }
+    return report
+
+
+def compare(results, baseline, threshold):
+    """ Return a line for each phase that is slower than in baseline by more than threshold """
+    regressions = []
+    for kind, phases in results.items():
+        for phase, values in phases.items():
+            previous = baseline.get(kind, {}).get(phase)
+            if previous and values['ms'] > previous['ms'] * threshold:
+                regressions.append('{} {}: {:.2f}ms, baseline {:.2f}ms'.format(kind, phase, values['ms'],
+                                                                              previous['ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--kinds', nargs='*', help='Only benchmark these kinds, such as service or route')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='Compare with the JSON results of an earlier run')
+    parser.add_argument('--threshold', type=float, default=1.25)
+    args = parser.parse_args()
+
+    add_module_utils_path()
+    from ansible.module_utils import k8s_common, openshift_common
+    classes = {
+        'KubernetesAnsibleModule': k8s_common.KubernetesAnsibleModule,
+        'OpenShiftAnsibleModule': openshift_common.OpenShiftAnsibleModule,
+    }
+
+    results = {}
+    with FakeApiServer(latency=args.latency) as api:
+        auth = dict(kubeconfig=write_kubeconfig(api.url), host=api.url)
+        run_module(classes['KubernetesAnsibleModule'], 'namespace', 'V1', dict(auth, state='present', name='bench'))
+        for class_name, api_version, kind, build in KINDS:
+            if args.kinds and kind not in args.kinds:
+                continue
+            api_version = api_version or deployment_api_version()
+            results[kind] = run_kind(api, auth, classes[class_name], api_version, kind, build, args.runs)
+            for phase in PHASES:
+                values = results[kind][phase]
+                print('{:<18} {:<8} {:>8.2f}ms  peak={:>8.1f}KB  requests={}'.format(
+                    kind, phase, values['ms'], values['peak_kb'], values['requests']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print('REGRESSION ' + line)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
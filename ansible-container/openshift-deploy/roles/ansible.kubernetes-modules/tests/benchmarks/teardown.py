@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Measure how long it takes for a namespace holding N objects to be gone, after the destroy task deletes it. The fake
+API plays the namespace controller, which removes the objects left in a terminating namespace one at a time.
+
+Without teardown, the module returns as soon as the namespace is marked for deletion, and the namespace lingers
+until the controller is done. With teardown and wait, the module deletes the objects in parallel first, and only
+returns once the namespace is gone.
+
+    python tests/benchmarks/teardown.py --objects 200 --latency 0.01 --workers 8
+"""
+
+import argparse
+import time
+
+from fake_api import FakeApiServer
+from runner import add_module_utils_path, run_module, write_kubeconfig
+
+# The client reads and deletes deployments through the apps group, which a cluster serves them from along with the
+# extensions group. The fake API keeps each group apart.
+PLURALS = (
+    ('/apis/apps/v1beta1', 'deployments', 'Deployment'),
+    ('/api/v1', 'pods', 'Pod'),
+    ('/api/v1', 'services', 'Service'),
+    ('/api/v1', 'configmaps', 'ConfigMap'),
+)
+
+
+def populate(state, objects):
+    with state.lock:
+        for index in range(objects):
+            prefix, plural, kind = PLURALS[index % len(PLURALS)]
+            name = '{}-{}'.format(kind.lower(), index)
+            state.objects[(prefix, 'bench', plural, name)] = {
+                'kind': kind,
+                'metadata': {'name': name, 'namespace': 'bench', 'resourceVersion': state.next_resource_version()},
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--objects', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--termination-delay', type=float, default=1.0)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    add_module_utils_path()
+    from ansible.module_utils.k8s_common import KubernetesAnsibleModule
+
+    for mode in ('absent', 'teardown+wait'):
+        with FakeApiServer(latency=args.latency, termination_delay=args.termination_delay) as api:
+            auth = dict(kubeconfig=write_kubeconfig(api.url), host=api.url)
+            run_module(KubernetesAnsibleModule, 'namespace', 'V1', dict(auth, state='present', name='bench'))
+            populate(api.state, args.objects)
+            options = {}
+            if mode == 'teardown+wait':
+                options = dict(teardown=True, wait=True, wait_timeout=600, workers=args.workers)
+            start = time.time()
+            result = run_module(KubernetesAnsibleModule, 'namespace', 'V1',
+                                dict(auth, state='absent', name='bench', **options))
+            returned = time.time() - start
+            assert not result.get('failed'), result.get('msg')
+            while ('/api/v1', None, 'namespaces', 'bench') in api.state.objects:
+                time.sleep(0.01)
+            gone = time.time() - start
+            print('{:<14} objects={:<5} module returned={:.3f}s  namespace gone={:.3f}s'.format(
+                mode, args.objects, returned, gone))
+
+
+if __name__ == '__main__':
+    main()
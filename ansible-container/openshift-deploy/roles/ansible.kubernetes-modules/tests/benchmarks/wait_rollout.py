@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Compare waiting for a rollout with an `until` loop, which re-runs the module every few seconds, and with `wait: true`,
+which runs the module once and watches the object until it is rolled out, for a deployment and a deployment config.
+The fake API plays the controllers, and reports the rollout as complete --rollout-delay seconds after each change.
+
+    python tests/benchmarks/wait_rollout.py --rollout-delay 5 --poll-delay 1
+"""
+
+import argparse
+import time
+
+from fake_api import FakeApiServer
+from runner import add_module_utils_path, deployment_api_version, run_module, write_kubeconfig
+
+
+def deployment(replicas):
+    return {
+        'apiVersion': 'extensions/v1beta1',
+        'kind': 'Deployment',
+        'metadata': {'name': 'web', 'namespace': 'bench'},
+        'spec': {
+            'replicas': replicas,
+            'template': {
+                'metadata': {'labels': {'app': 'web'}},
+                'spec': {'containers': [{'name': 'web', 'image': 'nginx:1.13'}]},
+            },
+        },
+    }
+
+
+def deployment_config(replicas):
+    return {
+        'apiVersion': 'v1',
+        'kind': 'DeploymentConfig',
+        'metadata': {'name': 'web', 'namespace': 'bench'},
+        'spec': {
+            'replicas': replicas,
+            'selector': {'app': 'web'},
+            'template': {
+                'metadata': {'labels': {'app': 'web'}},
+                'spec': {'containers': [{'name': 'web', 'image': 'nginx:1.13'}]},
+            },
+            'triggers': [{'type': 'ConfigChange'}],
+        },
+    }
+
+
+def rolled_out(result, kind):
+    obj = result[kind]
+    status = obj.get('status') or {}
+    desired = obj['spec'].get('replicas', 1)
+    return (status.get('observed_generation') == obj['metadata'].get('generation') and
+            status.get('updated_replicas') == desired and status.get('available_replicas') == desired)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rollout-delay', type=float, default=5.0)
+    parser.add_argument('--poll-delay', type=float, default=1.0)
+    parser.add_argument('--latency', type=float, default=0.01)
+    args = parser.parse_args()
+
+    add_module_utils_path()
+    from ansible.module_utils.k8s_common import KubernetesAnsibleModule
+    from ansible.module_utils.openshift_common import OpenShiftAnsibleModule
+
+    cases = (
+        (KubernetesAnsibleModule, deployment_api_version(), 'deployment', deployment),
+        (OpenShiftAnsibleModule, 'V1', 'deployment_config', deployment_config),
+    )
+    for module_class, api_version, kind, build in cases:
+        for mode in ('until loop', 'wait'):
+            with FakeApiServer(latency=args.latency, rollout_delay=args.rollout_delay) as api:
+                auth = dict(kubeconfig=write_kubeconfig(api.url), host=api.url)
+                run_module(KubernetesAnsibleModule, 'namespace', 'V1',
+                           dict(auth, state='present', name='bench'))
+                api.state.reset_counts()
+                start = time.time()
+                runs = 0
+                if mode == 'until loop':
+                    while True:
+                        runs += 1
+                        result = run_module(module_class, kind, api_version,
+                                            dict(auth, state='present', resource_definition=build(3)))
+                        if result.get('failed') or rolled_out(result, kind):
+                            break
+                        time.sleep(args.poll_delay)
+                else:
+                    runs += 1
+                    result = run_module(module_class, kind, api_version,
+                                        dict(auth, state='present', wait=True, wait_timeout=int(args.rollout_delay * 4),
+                                             resource_definition=build(3)))
+                assert not result.get('failed'), result.get('msg')
+                elapsed = time.time() - start
+                print('{:<18} {:<11} module runs={:<4} wall={:.3f}s  requests={}'.format(
+                    kind, mode, runs, elapsed, api.state.requests))
+
+
+if __name__ == '__main__':
+    main()
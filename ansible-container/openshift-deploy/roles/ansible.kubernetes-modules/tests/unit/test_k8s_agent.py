@@ -0,0 +1,186 @@
+"""
+Unit checks for the agent protocol of module_utils/k8s_agent.py: messages, exceptions raised in the agent, auth
+resolved in the module, and helper calls made through an agent served from a thread, against the fake API.
+
+    python -m unittest discover -s tests/unit
+"""
+
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from fake_api import FakeApiServer  # noqa: E402
+from runner import add_module_utils_path, write_kubeconfig  # noqa: E402
+
+add_module_utils_path()
+
+from ansible.module_utils.k8s_agent import (  # noqa: E402
+    AgentClient, AgentError, AgentHelperProxy, AgentHandler, AgentServer, AgentState, describe_exception,
+    kubeconfig_stamp, rebuild_exception, receive_message, resolve_auth, send_message
+)
+
+
+def round_trip(exc):
+    """ Describe exc as the agent does, pass it through a socket, and rebuild it as the module does """
+    left, right = socket.socketpair()
+    try:
+        send_message(left, {'error': describe_exception(exc)})
+        return rebuild_exception(receive_message(right)['error'])
+    finally:
+        left.close()
+        right.close()
+
+
+class MessageTest(unittest.TestCase):
+    def test_messages_round_trip(self):
+        message = (('KubernetesAnsibleModuleHelper', 'V1', 'config_map', (('host', 'https://a'),)), 'get_object',
+                   ('web', 'bench'), {})
+        left, right = socket.socketpair()
+        try:
+            send_message(left, message)
+            send_message(left, {'result': None})
+            self.assertEqual(receive_message(right), message)
+            self.assertEqual(receive_message(right), {'result': None})
+        finally:
+            left.close()
+            right.close()
+
+
+class ExceptionTest(unittest.TestCase):
+    def test_api_exception_keeps_status_and_body(self):
+        from kubernetes.client.rest import ApiException
+        exc = ApiException(status=409, reason='Conflict')
+        exc.body = '{"message": "the object has been modified"}'
+        rebuilt = round_trip(exc)
+        self.assertIsInstance(rebuilt, ApiException)
+        self.assertEqual((rebuilt.status, rebuilt.reason, rebuilt.body), (409, 'Conflict', exc.body))
+
+    def test_helper_exception_keeps_message_and_value(self):
+        from openshift.helper.exceptions import KubernetesException
+        rebuilt = round_trip(KubernetesException('Not found', status=404))
+        self.assertIsInstance(rebuilt, KubernetesException)
+        self.assertEqual(rebuilt.message, 'Not found')
+        self.assertEqual(rebuilt.value.get('status'), 404)
+
+    def test_rejected_argument_is_a_type_error(self):
+        self.assertIsInstance(round_trip(TypeError("Got an unexpected keyword argument 'limit'")), TypeError)
+
+    def test_other_exceptions_become_agent_errors(self):
+        rebuilt = round_trip(ValueError('bad'))
+        self.assertIsInstance(rebuilt, AgentError)
+        self.assertEqual(str(rebuilt), 'bad')
+
+
+class AuthTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.kubeconfig = os.path.join(self.tmp_dir, 'config')
+        with open(self.kubeconfig, 'w') as f:
+            f.write('apiVersion: v1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_environment_fills_unset_options(self):
+        environ = {'K8S_AUTH_HOST': 'https://b', 'K8S_AUTH_CONTEXT': 'b', 'KUBECONFIG': self.kubeconfig}
+        auth = resolve_auth({'host': None, 'context': 'a', 'username': 'u'}, environ)
+        self.assertEqual(auth['host'], 'https://b')
+        self.assertEqual(auth['context'], 'a')
+        self.assertEqual(auth['username'], 'u')
+        self.assertEqual(auth['kubeconfig'], self.kubeconfig)
+
+    def test_kubeconfig_option_takes_precedence(self):
+        environ = {'K8S_AUTH_KUBECONFIG': '/elsewhere', 'KUBECONFIG': self.kubeconfig}
+        self.assertEqual(resolve_auth({}, environ)['kubeconfig'], '/elsewhere')
+        self.assertEqual(resolve_auth({'kubeconfig': '/given'}, environ)['kubeconfig'], '/given')
+
+    def test_missing_kubeconfig_means_none(self):
+        environ = {'KUBECONFIG': os.path.join(self.tmp_dir, 'missing')}
+        self.assertEqual(resolve_auth({}, environ)['kubeconfig'], '')
+        self.assertEqual(kubeconfig_stamp({'kubeconfig': ''}), ())
+
+    def test_stamp_changes_with_the_file(self):
+        stamp = kubeconfig_stamp({'kubeconfig': self.kubeconfig})
+        with open(self.kubeconfig, 'a') as f:
+            f.write('kind: Config\n')
+        self.assertNotEqual(kubeconfig_stamp({'kubeconfig': self.kubeconfig}), stamp)
+
+
+class AgentTest(unittest.TestCase):
+    """ Helper calls made through an agent, served from a thread of this process """
+
+    def setUp(self):
+        self.api = FakeApiServer().__enter__()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.server = AgentServer(os.path.join(self.tmp_dir, 'agent.sock'), AgentHandler)
+        self.server.state = AgentState()
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.kubeconfig = write_kubeconfig(self.api.url)
+
+    def tearDown(self):
+        self.stop_agent()
+        self.api.__exit__(None, None, None)
+        shutil.rmtree(self.tmp_dir)
+        os.remove(self.kubeconfig)
+
+    def stop_agent(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def proxy(self):
+        from openshift.helper.ansible import KubernetesAnsibleModuleHelper
+        client = AgentClient.connect(self.server.server_address)
+        self.assertIsNotNone(client)
+        helper = AgentHelperProxy(client, KubernetesAnsibleModuleHelper('v1', 'config_map'), 'v1', 'config_map')
+        helper.set_client_config(kubeconfig=self.kubeconfig)
+        return helper
+
+    def test_calls_run_in_the_agent(self):
+        from kubernetes.client.rest import ApiException
+        helper = self.proxy()
+        body = {'apiVersion': 'v1', 'kind': 'ConfigMap', 'metadata': {'name': 'web'}, 'data': {'a': '1'}}
+        created = helper.call_api('create', 'bench', 'bench', body=body)
+        self.assertEqual(created.data, {'a': '1'})
+        self.assertEqual(helper.get_object('web', 'bench').metadata.resource_version,
+                         created.metadata.resource_version)
+        stale = dict(body, metadata={'name': 'web', 'resourceVersion': '0'})
+        with self.assertRaises(ApiException) as context:
+            helper.call_api('replace', 'bench', 'web', 'bench', body=stale)
+        self.assertEqual(context.exception.status, 409)
+        self.assertEqual(len(self.server.state.helpers), 1)
+
+    def test_helper_is_kept_per_cluster(self):
+        self.proxy().get_object('web', 'bench')
+        with FakeApiServer() as other:
+            kubeconfig = write_kubeconfig(other.url)
+            try:
+                helper = self.proxy()
+                helper.set_client_config(kubeconfig=kubeconfig)
+                helper.get_object('web', 'bench')
+            finally:
+                os.remove(kubeconfig)
+            self.assertEqual(other.state.requests, {'GET': 1})
+        self.assertEqual(len(self.server.state.helpers), 2)
+
+    def test_module_falls_back_to_the_local_helper(self):
+        helper = self.proxy()
+        # An agent that exits closes its connections, and its socket can no longer be connected to
+        self.stop_agent()
+        helper._client.socket().close()
+        self.assertIsNone(helper.get_object('web', 'bench'))
+        self.assertTrue(helper._local)
+        self.assertEqual(self.api.state.requests, {'GET': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
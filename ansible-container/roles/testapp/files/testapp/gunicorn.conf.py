@@ -0,0 +1,54 @@
+"""
+Gunicorn settings for serving testapp in production.
+
+Gunicorn forks a number of worker processes, each running the application, so requests are served on every core.
+Each setting can be overridden with an environment variable, or on the command line:
+
+    gunicorn --config /project/gunicorn.conf.py testapp.asgi
+
+Send SIGHUP to the master process (PID 1 in the container) to reload: new workers are started with the new code
+and settings, and the old ones finish the requests they are serving before they exit.
+
+For more information on these settings, see
+http://docs.gunicorn.org/en/stable/settings.html
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Worker processes. The usual recommendation is two per core, plus one.
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+
+# Each worker runs an event loop, serving testapp.asgi.application, so it can hold thousands of idle keep-alive
+# connections, and serve the async views without a thread per connection. To serve testapp.wsgi instead, set
+# GUNICORN_WORKER_CLASS to sync, or to gthread for GUNICORN_THREADS threads per worker.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+
+# Threads per worker. Only the sync workers use them, for testapp.wsgi: more than one turns a sync worker into a
+# gthread worker. The uvicorn workers ignore this setting.
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+# Connections each gthread worker holds open at a time
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Seconds an idle keep-alive connection is held open. Keep it above the idle timeout of any load balancer in
+# front of the containers, so that the load balancer closes connections first.
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Seconds a worker may spend on a request before it is restarted, and that workers are given to finish their
+# requests on reload or shutdown
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Restart each worker after this many requests, with some jitter so they do not all restart at once. 0 disables.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+# Load the application in the master before forking, so workers share its memory and start faster. A reload then
+# only picks up changed settings, not changed code, so it is off by default.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0') == '1'
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG') or None
+errorlog = '-'
@@ -0,0 +1,20 @@
+"""
+ASGI config for testapp project.
+
+It exposes the ASGI callable as a module-level variable named ``application``. Health checks on /ping
+are answered before the request reaches Django, see health.py. The URLconf routes to the async views.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+from .health import asgi_health_check
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testapp.settings")
+os.environ.setdefault("TESTAPP_ASYNC_VIEWS", "1")
+
+application = asgi_health_check(get_asgi_application())
@@ -0,0 +1,40 @@
+"""
+Health checks for testapp.
+
+Orchestrators and load balancers request /ping on every container, every second or so. The answer never changes, so
+these wrappers send it straight from the ASGI and WSGI entry points, before Django resolves the URL and runs the
+middleware chain, which would otherwise load sessions and users for a constant response. Every other request is
+passed on to Django. views.echo still serves the same response, for when the application runs without the wrappers,
+e.g. under manage.py runserver.
+"""
+
+PATH = '/ping'
+METHODS = ('GET', 'HEAD')
+BODY = b'{"ping": 1}'
+HEADERS = [
+    (b'content-type', b'application/json'),
+    (b'content-length', str(len(BODY)).encode('ascii')),
+]
+
+
+def asgi_health_check(application):
+    """ Wrap an ASGI application, answering health checks without calling it """
+    async def wrapper(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == PATH and scope['method'] in METHODS:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': HEADERS})
+            await send({'type': 'http.response.body', 'body': BODY if scope['method'] == 'GET' else b''})
+            return
+        await application(scope, receive, send)
+    return wrapper
+
+
+def wsgi_health_check(application):
+    """ Wrap a WSGI application, answering health checks without calling it """
+    headers = [(name.decode('ascii'), value.decode('ascii')) for name, value in HEADERS]
+
+    def wrapper(environ, start_response):
+        if environ.get('PATH_INFO') == PATH and environ.get('REQUEST_METHOD') in METHODS:
+            start_response('200 OK', headers)
+            return [BODY] if environ['REQUEST_METHOD'] == 'GET' else []
+        return application(environ, start_response)
+    return wrapper
@@ -1,7 +1,8 @@
 """
 WSGI config for testapp project.
 
-It exposes the WSGI callable as a module-level variable named ``application``.
+It exposes the WSGI callable as a module-level variable named ``application``. Health checks on /ping
+are answered before the request reaches Django, see health.py.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/1.11/howto/deployment/wsgi/
@@ -11,6 +12,8 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from .health import wsgi_health_check
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testapp.settings")
 
-application = get_wsgi_application()
+application = wsgi_health_check(get_wsgi_application())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Hold many concurrent keep-alive connections to testapp, as the health checks of load balancers do, and compare
+testapp.asgi on event loop workers with testapp.wsgi on threaded workers.
+
+Each connection sends GET /ping every --interval seconds for --duration seconds, reusing the connection while the
+server keeps it open, and opening a new one when it does not. The report shows the health checks answered, the
+failures, the connections the server was still holding at the end, and the latency of the checks.
+
+    python3 benchmarks/concurrency.py --connections 2000 --workers 2 --threads 8
+
+Use --url to test a server that is already running, such as a container started with docker-compose up, instead.
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import signal
+import time
+import urllib.parse
+
+from load_test import start_gunicorn
+
+REQUEST = 'GET /ping HTTP/1.1\r\nHost: {}\r\n\r\n'
+
+
+class Stats(object):
+    def __init__(self):
+        self.answered = 0
+        self.failed = 0
+        self.reconnects = 0
+        self.open = 0
+        self.latencies = []
+
+
+async def read_response(reader):
+    """ Read one response, returning (status, whether the server will close the connection) """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    length = 0
+    close = status_line.startswith(b'HTTP/1.0')
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+        elif name.lower() == 'connection':
+            close = value.strip().lower() != 'keep-alive'
+    await reader.readexactly(length)
+    return status, close
+
+
+async def health_check(host, port, interval, deadline, stats):
+    """ Send a health check every interval seconds on one connection, until deadline """
+    request = REQUEST.format(host).encode('ascii')
+    reader = writer = None
+    while time.time() < deadline:
+        start = time.time()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), interval * 10)
+            writer.write(request)
+            status, close = await asyncio.wait_for(read_response(reader), interval * 10)
+            if status == 200:
+                stats.answered += 1
+                stats.latencies.append(time.time() - start)
+            else:
+                stats.failed += 1
+        except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            stats.failed += 1
+            close = True
+        if close and writer is not None:
+            writer.close()
+            reader = writer = None
+            stats.reconnects += 1
+        await asyncio.sleep(max(0, interval - (time.time() - start)))
+    if writer is not None:
+        stats.open += 1
+        writer.close()
+
+
+async def run(host, port, connections, interval, duration):
+    stats = Stats()
+    deadline = time.time() + duration
+    tasks = []
+    for _ in range(connections):
+        tasks.append(asyncio.ensure_future(health_check(host, port, interval, deadline, stats)))
+        # Spread the checks over the interval, as independent load balancers would
+        await asyncio.sleep(interval / connections)
+    await asyncio.gather(*tasks)
+    return stats
+
+
+def report(label, connections, stats):
+    latencies = sorted(stats.latencies) or [0.0]
+    print('{:<32} connections={:<6} answered={:<8} failed={:<6} reconnects={:<7} held={:<6} '
+          'p50={:.2f}ms  p99={:.2f}ms'.format(label, connections, stats.answered, stats.failed, stats.reconnects,
+                                              stats.open, latencies[len(latencies) // 2] * 1e3,
+                                              latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3))
+
+
+def raise_file_limit(connections):
+    """ Each connection needs a file descriptor, on both ends """
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = connections * 2 + 100
+    if soft != resource.RLIM_INFINITY and soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted if hard == resource.RLIM_INFINITY else min(wanted, hard),
+                                                    hard))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Test this server, instead of starting gunicorn')
+    parser.add_argument('--connections', type=int, default=2000)
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between health checks on a connection')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='Threads per worker, for testapp.wsgi')
+    parser.add_argument('--keepalive', type=int, default=75, help='Seconds the server keeps idle connections open')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    raise_file_limit(args.connections)
+
+    if args.url:
+        parsed = urllib.parse.urlsplit(args.url)
+        stats = asyncio.run(run(parsed.hostname, parsed.port or 80, args.connections, args.interval, args.duration))
+        report(args.url, args.connections, stats)
+        return
+
+    os.environ['GUNICORN_KEEPALIVE'] = str(args.keepalive)
+    os.environ['GUNICORN_WORKER_CONNECTIONS'] = str(args.connections)
+    for interface, threads in (('wsgi', args.threads), ('asgi', 1)):
+        server = start_gunicorn(args.port, args.workers, threads, interface)
+        try:
+            stats = asyncio.run(run('127.0.0.1', args.port, args.connections, args.interval, args.duration))
+            report('{} workers={} threads={}'.format(interface, args.workers, threads), args.connections, stats)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Compare admin and auth throughput across several web replicas, with the SQLite database and with PostgreSQL.
+
+A number of gunicorn servers are started, each standing in for a web container, all configured with the same
+database. Each client is logged in as a staff user, through a session created up front so that no password has to be
+hashed, and then repeatedly loads the admin change form of its own group and saves it with a new name. Every iteration
+therefore reads the session, the user and their permissions, and writes the group and an admin log entry. With SQLite,
+the replicas share one database file, whose writes are serialized by its lock.
+
+PostgreSQL is configured with the DATABASE_* environment variables, as in the containers. Start the server from the
+compose override, which publishes it on localhost:
+
+    docker-compose -f docker-compose.yml -f docker-compose.postgres.yml up -d db
+    DATABASE_HOST=127.0.0.1 DATABASE_PASSWORD=testapp python3 benchmarks/database.py --replicas 4 --clients 16
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+from load_test import PROJECT_DIR, start_gunicorn
+
+CSRF_TOKEN = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+# Run with manage.py shell: create a staff user, a logged in session and a group for each client
+FIXTURES = '''
+import json
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.sessions.backends.db import SessionStore
+
+clients = []
+for index in range({clients}):
+    user, _ = get_user_model().objects.get_or_create(username='bench{{}}'.format(index),
+                                                     defaults=dict(is_staff=True, is_superuser=True))
+    user.set_unusable_password()
+    user.save()
+    group, _ = Group.objects.get_or_create(name='bench{{}}'.format(index))
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    clients.append((session.session_key, group.pk))
+print(json.dumps(clients))
+'''
+
+
+def manage(env, *args):
+    return subprocess.run([sys.executable, 'manage.py'] + list(args), cwd=PROJECT_DIR, env=env, check=True,
+                          stdout=subprocess.PIPE, universal_newlines=True).stdout
+
+
+def client(port, session_key, group_id, duration, results):
+    """ Load and save the group's change form for duration seconds, and put (iterations, errors) on results """
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    cookies = {'sessionid': session_key}
+    path = '/admin/auth/group/{}/change/'.format(group_id)
+    iterations = errors = 0
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        try:
+            cookie = '; '.join('{}={}'.format(name, value) for name, value in cookies.items())
+            connection.request('GET', path, headers={'Cookie': cookie})
+            response = connection.getresponse()
+            body = response.read().decode('utf-8')
+            for header in response.msg.get_all('Set-Cookie') or []:
+                name, _, value = header.split(';', 1)[0].partition('=')
+                cookies[name] = value
+            token = CSRF_TOKEN.search(body)
+            if response.status != 200 or not token:
+                errors += 1
+                continue
+            form = urllib.parse.urlencode({'csrfmiddlewaretoken': token.group(1), 'name': 'bench-{}-{}'.format(
+                group_id, iterations)})
+            cookie = '; '.join('{}={}'.format(name, value) for name, value in cookies.items())
+            connection.request('POST', path, body=form, headers={
+                'Cookie': cookie, 'Content-Type': 'application/x-www-form-urlencoded'})
+            response = connection.getresponse()
+            response.read()
+            if response.status != 302:
+                errors += 1
+                continue
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            continue
+        iterations += 1
+    connection.close()
+    results.put((iterations, errors))
+
+
+def run(engine, args):
+    """ Start the replicas on a fresh database, load them, and return (iterations per second, errors) """
+    # Each engine gets an environment of its own, so nothing set for one leaks into the next
+    env = dict(os.environ, DATABASE_ENGINE=engine)
+    tmp_dir = tempfile.mkdtemp(prefix='testapp-db-')
+    if engine == 'sqlite3':
+        env['DATABASE_NAME'] = os.path.join(tmp_dir, 'db.sqlite3')
+    servers = []
+    try:
+        manage(env, 'migrate', '--noinput')
+        output = manage(env, 'shell', '-c', FIXTURES.format(clients=args.clients))
+        # Newer versions of the shell command print a note about the models they import before the output
+        clients = json.loads(output.strip().splitlines()[-1])
+        for replica in range(args.replicas):
+            servers.append(start_gunicorn(args.port + replica, args.workers, env=env))
+
+        results = multiprocessing.Queue()
+        processes = []
+        for index, (session_key, group_id) in enumerate(clients):
+            port = args.port + index % args.replicas
+            processes.append(multiprocessing.Process(target=client, args=(port, session_key, group_id,
+                                                                          args.duration, results)))
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        return sum(result[0] for result in collected) / args.duration, sum(result[1] for result in collected)
+    finally:
+        for server in servers:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engines', nargs='*', choices=('sqlite3', 'postgresql'),
+                        help='Databases to compare (default: sqlite3, and postgresql if DATABASE_HOST is set)')
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=1, help='Gunicorn workers per replica')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    engines = args.engines or ['sqlite3'] + (['postgresql'] if os.environ.get('DATABASE_HOST') else [])
+    for engine in engines:
+        rate, errors = run(engine, args)
+        print('{:<11} replicas={:<3} clients={:<4} {:>8.1f} saves/s  errors={}'.format(
+            engine, args.replicas, args.clients, rate, errors))
+
+
+if __name__ == '__main__':
+    main()
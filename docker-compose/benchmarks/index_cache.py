@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Load test the index page with a few distinct Host headers, as it is requested behind front-end proxies, and compare:
+
+    full        plain requests, answered with the page from memory
+    gzip        requests accepting gzip, answered with the page compressed once per host
+    revalidate  requests carrying the ETag of an earlier response, answered with 304 Not Modified
+
+Besides requests per second, the average size of the responses is reported.
+
+    python3 benchmarks/index_cache.py --hosts 4 --clients 8 --duration 10
+"""
+
+import argparse
+import http.client
+import multiprocessing
+import signal
+import time
+import urllib.parse
+
+from load_test import start_gunicorn
+
+MODES = ('full', 'gzip', 'revalidate')
+
+
+def client(url, hosts, mode, duration, results):
+    """ Request / for duration seconds, rotating through hosts, and put (requests, errors, bytes) on results """
+    parsed = urllib.parse.urlsplit(url)
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+    etags = {}
+    requests = errors = received = 0
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        host = hosts[requests % len(hosts)]
+        headers = {'Host': host}
+        if mode == 'gzip':
+            headers['Accept-Encoding'] = 'gzip'
+        elif mode == 'revalidate' and host in etags:
+            headers['If-None-Match'] = etags[host]
+        try:
+            connection.request('GET', '/', headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+            if response.will_close:
+                connection.close()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            continue
+        if response.status == 200:
+            etags[host] = response.getheader('ETag')
+        elif response.status != 304:
+            errors += 1
+        requests += 1
+        received += len(body)
+    connection.close()
+    results.put((requests, errors, received))
+
+
+def load(url, hosts, mode, clients, duration):
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=client, args=(url, hosts, mode, duration, results))
+                 for _ in range(clients)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    requests = sum(result[0] for result in collected)
+    return requests / duration, sum(result[1] for result in collected), sum(result[2] for result in collected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Load test this server, instead of starting gunicorn')
+    parser.add_argument('--hosts', type=int, default=4, help='Number of distinct Host headers')
+    parser.add_argument('--clients', type=int, default=2 * multiprocessing.cpu_count())
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    hosts = ['site{}.example.com'.format(index) for index in range(args.hosts)]
+    server = None
+    url = args.url
+    if not url:
+        server = start_gunicorn(args.port, args.workers)
+        url = 'http://127.0.0.1:{}'.format(args.port)
+    try:
+        for mode in MODES:
+            rps, errors, received = load(url, hosts, mode, args.clients, args.duration)
+            print('{:<12} hosts={:<3} {:>9.0f} req/s  {:>8.1f} bytes/response  errors={}'.format(
+                mode, args.hosts, rps, received / max(1, rps * args.duration), errors))
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
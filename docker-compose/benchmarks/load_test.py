@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Load test testapp on /ping and /, and report requests per second and latency as the number of gunicorn workers
+grows, up to one per core by default. The application is served through testapp.asgi, as in the containers, or through
+testapp.wsgi with --interface wsgi.
+
+By default the script starts gunicorn itself, from the testapp directory next to this one, with the same config file
+the containers use, so Django and gunicorn must be installed locally (pip install -r requirements.txt). The load is
+generated by separate client processes, each holding one connection open between requests where the server allows it.
+
+    python3 benchmarks/load_test.py --workers 1 2 4 --clients 16 --duration 10
+    python3 benchmarks/load_test.py --interface wsgi --threads 4 --workers 1 2 4
+
+Use --url to load test a server that is already running, such as a container started with docker-compose up, instead.
+"""
+
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.parse
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'testapp')
+PATHS = ('/ping', '/')
+
+
+def client(url, path, duration, results):
+    """ Send requests for duration seconds, and put (requests, errors, latencies) on the results queue """
+    parsed = urllib.parse.urlsplit(url)
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+    latencies = []
+    errors = 0
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        start = time.time()
+        try:
+            connection.request('GET', path, headers={'Host': parsed.netloc})
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+            if response.will_close:
+                connection.close()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            continue
+        latencies.append(time.time() - start)
+    connection.close()
+    results.put((len(latencies), errors, latencies))
+
+
+def load(url, path, clients, duration):
+    """ Run clients concurrently against url + path, and return (requests per second, errors, p50, p99) """
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=client, args=(url, path, duration, results)) for _ in range(clients)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    requests = sum(result[0] for result in collected)
+    errors = sum(result[1] for result in collected)
+    latencies = sorted(latency for result in collected for latency in result[2])
+    if not latencies:
+        return 0.0, errors, 0.0, 0.0
+    return (requests / duration, errors, latencies[len(latencies) // 2],
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))])
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('gunicorn did not start listening on port {}'.format(port))
+
+
+def start_gunicorn(port, workers, threads=1, interface='asgi', env=None):
+    """
+    Start gunicorn with the containers' config file, serving testapp.asgi or testapp.wsgi, in env, which defaults to
+    the environment of this process
+    """
+    env = dict(os.environ if env is None else env, GUNICORN_BIND='127.0.0.1:{}'.format(port),
+               GUNICORN_WORKERS=str(workers), GUNICORN_THREADS=str(threads))
+    if interface == 'wsgi':
+        env['GUNICORN_WORKER_CLASS'] = 'gthread' if threads > 1 else 'sync'
+    app = 'testapp.{}'.format(interface)
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', app],
+                              cwd=PROJECT_DIR, env=env, stderr=subprocess.DEVNULL)
+    wait_for_port(port)
+    return server
+
+
+def report(label, path, result):
+    rps, errors, p50, p99 = result
+    print('{:<30} {:<6} {:>9.0f} req/s  p50={:>7.2f}ms  p99={:>7.2f}ms  errors={}'.format(
+        label, path, rps, p50 * 1e3, p99 * 1e3, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Load test this server, instead of starting gunicorn')
+    parser.add_argument('--workers', type=int, nargs='*',
+                        help='Numbers of gunicorn workers to compare (default: 1, 2, 4 ... up to one per core)')
+    parser.add_argument('--interface', choices=('asgi', 'wsgi'), default='asgi')
+    parser.add_argument('--threads', type=int, default=1, help='Threads per gunicorn worker, with --interface wsgi')
+    parser.add_argument('--clients', type=int, default=2 * multiprocessing.cpu_count())
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.url:
+        for path in PATHS:
+            report(args.url, path, load(args.url, path, args.clients, args.duration))
+        return
+
+    workers = args.workers
+    if not workers:
+        workers = [1]
+        while workers[-1] * 2 <= multiprocessing.cpu_count():
+            workers.append(workers[-1] * 2)
+    url = 'http://127.0.0.1:{}'.format(args.port)
+    for count in workers:
+        server = start_gunicorn(args.port, count, args.threads, args.interface)
+        try:
+            # Warm up, so each worker has imported Django and loaded the URLconf
+            load(url, '/ping', args.clients, 1)
+            for path in PATHS:
+                report('{} workers={} threads={}'.format(args.interface, count, args.threads), path,
+                       load(url, path, args.clients, args.duration))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
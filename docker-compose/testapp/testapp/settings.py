@@ -71,14 +71,47 @@ WSGI_APPLICATION = 'testapp.wsgi.application'
 
 
 # Database
-# https://docs.djangoproject.com/en/1.11/ref/settings/#databases
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+#
+# By default each container has its own SQLite database file. Set DATABASE_ENGINE to postgresql to share one
+# PostgreSQL server between all the replicas instead, configured with the DATABASE_* environment variables.
+
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite3')
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'testapp'),
+            'USER': os.environ.get('DATABASE_USER', 'testapp'),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', 'db'),
+            'PORT': os.environ.get('DATABASE_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    # Each worker process keeps a pool of open connections, which the requests it serves borrow and return, so
+    # that a request does not pay for connecting. Set DATABASE_POOL_MAX_SIZE to 0 to keep a persistent connection
+    # per thread for DATABASE_CONN_MAX_AGE seconds instead, which suits the sync and gthread WSGI workers.
+    # Under ASGI, persistent connections are closed after each request, so only the pool helps there.
+    DATABASE_POOL_MAX_SIZE = int(os.environ.get('DATABASE_POOL_MAX_SIZE', 4))
+    if DATABASE_POOL_MAX_SIZE:
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 1)),
+                'max_size': DATABASE_POOL_MAX_SIZE,
+                'timeout': int(os.environ.get('DATABASE_POOL_TIMEOUT', 10)),
+            },
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DATABASE_CONN_MAX_AGE', 60))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        }
     }
-}
 
 
 # Password validation
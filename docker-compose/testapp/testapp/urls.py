@@ -1,24 +1,33 @@
 """testapp URL Configuration
 
 The `urlpatterns` list routes URLs to views. For more information please see:
-    https://docs.djangoproject.com/en/1.11/topics/http/urls/
+    https://docs.djangoproject.com/en/3.1/topics/http/urls/
 Examples:
 Function views
     1. Add an import:  from my_app import views
-    2. Add a URL to urlpatterns:  url(r'^$', views.home, name='home')
+    2. Add a URL to urlpatterns:  path('', views.home, name='home')
 Class-based views
     1. Add an import:  from other_app.views import Home
-    2. Add a URL to urlpatterns:  url(r'^$', Home.as_view(), name='home')
+    2. Add a URL to urlpatterns:  path('', Home.as_view(), name='home')
 Including another URLconf
-    1. Import the include() function: from django.conf.urls import url, include
-    2. Add a URL to urlpatterns:  url(r'^blog/', include('blog.urls'))
+    1. Import the include() function: from django.urls import include, path
+    2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.conf.urls import url
+import os
+
 from django.contrib import admin
-from .views import index, echo
+from django.urls import path
+from . import views
+
+# testapp.asgi sets TESTAPP_ASYNC_VIEWS, so that event loop workers serve the async views without a thread, and
+# WSGI workers the sync views without an event loop per request
+if os.environ.get('TESTAPP_ASYNC_VIEWS') == '1':
+    index, echo = views.async_index, views.async_echo
+else:
+    index, echo = views.index, views.echo
 
 urlpatterns = [
-    url(r'^$', index),
-    url(r'^ping$', echo),
-    url(r'^admin/', admin.site.urls),
+    path('', index),
+    path('ping', echo),
+    path('admin/', admin.site.urls),
 ]
@@ -1,9 +1,39 @@
+import functools
+import hashlib
+import re
+import time
+
 from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.text import compress_string
 
+# The index page only changes with a deploy, so it was last modified when the application started
+STARTED = time.time()
 
-def index(request):
-    host = request.get_host()
-    return HttpResponse(
+# Hosts whose index page is kept in memory. The Host header comes from the client, so the cache is bounded.
+MAX_CACHED_HOSTS = 64
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class CachedPage(object):
+    """ A rendered page, with its ETag, and its gzipped body once a client has asked for it """
+
+    def __init__(self, content):
+        self.content = content
+        self.etag = '"{}"'.format(hashlib.md5(content).hexdigest())
+        self._gzipped = None
+
+    @property
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = compress_string(self.content)
+        return self._gzipped
+
+
+def render_index(host):
+    return (
         "<html><head><title>" + host + " - Deploy test</title></head><body>"
         + "<img border='0' src='https://www.docker.com/sites/default/files/mono_horizontal_large.png'></img>"
         + "<h1>Deployment complete!</h1>"
@@ -11,5 +41,41 @@ def index(request):
         + "</body></html>"
     )
 
+
+@functools.lru_cache(maxsize=MAX_CACHED_HOSTS)
+def index_page(host):
+    return CachedPage(render_index(host).encode('utf-8'))
+
+
+def index_response(request):
+    page = index_page(request.get_host())
+    gzip = ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    # Each encoding is a different representation, so it gets its own ETag
+    etag = page.etag[:-1] + '-gzip"' if gzip else page.etag
+    response = get_conditional_response(request, etag=etag, last_modified=int(STARTED))
+    if response is None:
+        response = HttpResponse(page.gzipped if gzip else page.content)
+        if gzip:
+            response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(STARTED)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+# The views come in two flavours, as Django runs a view of the other kind through asgiref: an async view served
+# through testapp.wsgi runs in an event loop started for each request (async_to_sync), and a sync view served
+# through testapp.asgi runs in a thread (sync_to_async). urls.py selects the flavour of the entry point.
+
+def index(request):
+    return index_response(request)
+
 def echo(request):
     return JsonResponse({"ping": 1})
+
+
+async def async_index(request):
+    return index_response(request)
+
+async def async_echo(request):
+    return JsonResponse({"ping": 1})
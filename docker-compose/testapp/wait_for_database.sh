@@ -0,0 +1,16 @@
+#!/bin/sh
+# Entrypoint of the compose services that use the shared database. Version 3 compose files cannot make a service wait
+# until another is healthy or has exited, so the services wait for the database themselves.
+#
+# wait_for_database.sh migrate      apply the migrations, as soon as the database accepts connections
+# wait_for_database.sh COMMAND...   wait until every migration has been applied, then exec COMMAND
+if [ "$1" = migrate ]; then
+    until python3 /project/manage.py migrate --noinput; do
+        sleep 2
+    done
+else
+    until python3 /project/manage.py migrate --check >/dev/null 2>&1; do
+        sleep 2
+    done
+    exec "$@"
+fi